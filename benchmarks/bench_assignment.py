@@ -0,0 +1,205 @@
+"""
+Assignment engine benchmark and statistical check
+
+For every group size it times bot.assignment.draw (plain, and with mutual
+exclusions plus no 2-cycles), verifies every result, and checks the
+distribution:
+
+* sizes <= 1000: chi-square test that participant 0's receiver is uniform
+  over the other n - 1 participants
+* sizes <= 100: the same test for the constrained draw (couples excluded,
+  no 2-cycles), over the receivers participant 0 may draw
+* a group of 6 couples-and-no-2-cycles: chi-square over every valid draw,
+  which also catches bias that participant 0's receiver alone cannot show
+* all sizes: the mean number of 2-cycles should be close to 1/2, as it is
+  for a uniform random derangement
+
+It then times the matching solver on dense exclusions, for sizes up to
+--dense-max-size: households of 5 plus up to 200 random exclusions
+per participant, a clique covering a tenth of the group, and three
+participants who may only draw from the same two others, which has no
+valid draw and must raise Infeasible.
+
+No database needed. Usage:
+
+    python -m benchmarks.bench_assignment --max-size 1000000
+"""
+import argparse
+import itertools
+import math
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+
+from bot.assignment import Infeasible, draw, random_derangement
+
+
+def chi_square_critical(df: int, z: float = 3.09) -> float:
+    """Wilson-Hilferty approximation of the chi-square critical value (z=3.09 ~ p=0.001)"""
+    h = 2.0 / (9.0 * df)
+    return df * (1.0 - h + z * math.sqrt(h)) ** 3
+
+
+def two_cycles(perm) -> int:
+    """Number of pairs drawing each other"""
+    return sum(1 for i, j in enumerate(perm) if j > i and perm[j] == i)
+
+
+def check_valid(ids, receivers, exclusions=frozenset(), allow_two_cycles=True):
+    """Raise AssertionError if the draw breaks any rule"""
+    assert sorted(receivers) == sorted(ids), "not a permutation"
+    mapping = dict(zip(ids, receivers))
+    for giver, receiver in mapping.items():
+        assert giver != receiver, "self assignment"
+        assert (giver, receiver) not in exclusions, "excluded pair drawn"
+        if not allow_two_cycles:
+            assert mapping[receiver] != giver, "2-cycle drawn"
+
+
+def couples(n: int):
+    """Exclusions for couples (0,1), (2,3), ...: partners must not draw each other"""
+    exclusions = set()
+    for a in range(0, n - 1, 2):
+        exclusions.add((a, a + 1))
+        exclusions.add((a + 1, a))
+    return exclusions
+
+
+def chi_square(counts: Counter, outcomes, trials: int):
+    """Chi-square of counts against a uniform distribution over outcomes; (report, passed)"""
+    expected = trials / len(outcomes)
+    stat = sum((counts.get(k, 0) - expected) ** 2 / expected for k in outcomes)
+    critical = chi_square_critical(len(outcomes) - 1)
+    passed = stat < critical
+    return f"chi2={stat:.1f} (crit {critical:.1f}) {'ok' if passed else 'FAIL'}", passed
+
+
+def uniformity(n: int, trials: int, rng: random.Random, exclusions=frozenset(), allow_two_cycles=True):
+    """Chi-square of participant 0's receiver over those it may draw; (report, passed)"""
+    if exclusions or not allow_two_cycles:
+        ids = list(range(n))
+        counts = Counter(draw(ids, exclusions, allow_two_cycles, rng)[0] for _ in range(trials))
+    else:
+        counts = Counter(random_derangement(n, rng)[0] for _ in range(trials))
+    allowed = [k for k in range(1, n) if (0, k) not in exclusions]
+    return chi_square(counts, allowed, trials)
+
+
+def exact_uniformity(n: int, trials: int, rng: random.Random):
+    """Chi-square over every valid couples-and-no-2-cycles draw of a small group; (report, passed)"""
+    ids = list(range(n))
+    exclusions = couples(n)
+    valid = [
+        perm for perm in itertools.permutations(ids)
+        if all(perm[i] != i and (i, perm[i]) not in exclusions and perm[perm[i]] != i for i in ids)
+    ]
+    counts = Counter(tuple(draw(ids, exclusions, allow_two_cycles=False, rng=rng)) for _ in range(trials))
+    assert set(counts) <= set(valid), "invalid draw"
+    report, passed = chi_square(counts, valid, trials)
+    return f"n={n} all {len(valid)} valid draws | {report}", passed
+
+
+def run_size(n: int, rng: random.Random) -> None:
+    ids = list(range(n))
+    repeats = max(3, min(200, 2_000_000 // n))
+
+    # Plain draw
+    timings = []
+    cycle_counts = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        receivers = draw(ids, rng=rng)
+        timings.append(time.perf_counter() - start)
+        check_valid(ids, receivers)
+        cycle_counts.append(two_cycles(receivers))
+    plain = statistics.median(timings)
+
+    # Couples (0,1), (2,3), ... must not draw each other, and no 2-cycles
+    exclusions = couples(n)
+    start = time.perf_counter()
+    receivers = draw(ids, exclusions, allow_two_cycles=False, rng=rng)
+    constrained = time.perf_counter() - start
+    check_valid(ids, receivers, exclusions, allow_two_cycles=False)
+
+    line = (
+        f"n={n:>9,} | plain {plain * 1000:9.2f}ms ({plain / n * 1e9:6.0f} ns/id) | "
+        f"constrained {constrained * 1000:9.2f}ms | "
+        f"mean 2-cycles {statistics.mean(cycle_counts):.2f} over {repeats}"
+    )
+    if n <= 1000:
+        report, passed = uniformity(n, max(20 * n, 20_000), rng)
+        line += f" | {report}"
+        if n <= 100:
+            constrained_report, constrained_passed = uniformity(
+                n, max(20 * n, 20_000), rng, exclusions, allow_two_cycles=False
+            )
+            line += f" | constrained {constrained_report}"
+            passed = passed and constrained_passed
+        print(line)
+        if not passed:
+            sys.exit(f"Receiver distribution is not uniform at n={n}")
+    else:
+        print(line)
+
+
+def clique(members):
+    return {(a, b) for a in members for b in members if a != b}
+
+
+def run_dense(n: int, rng: random.Random) -> None:
+    ids = list(range(n))
+    households = set()
+    for start in range(0, n, 5):
+        households |= clique(range(start, min(start + 5, n)))
+    for giver in ids:
+        for receiver in rng.sample(ids, min(n // 10, 200)):
+            households.add((giver, receiver))
+    # 0, 1 and 2 may only draw 3 or 4
+    cornered = {(giver, receiver) for giver in range(3) for receiver in range(5, n)} | clique(range(3))
+    cases = [
+        ("households", households, True),
+        ("clique n/10", clique(range(n // 10)), True),
+        ("cornered", cornered, False),
+    ]
+    line = f"n={n:>9,} | dense"
+    for name, exclusions, feasible in cases:
+        start = time.perf_counter()
+        try:
+            receivers = draw(ids, exclusions, rng=rng)
+        except Infeasible as e:
+            assert not feasible, f"{name}: unexpected Infeasible"
+            assert len(e.receivers) < len(e.givers), "witness is not a Hall violator"
+            outcome = "infeasible"
+        else:
+            assert feasible, f"{name}: drew an impossible assignment"
+            check_valid(ids, receivers, exclusions)
+            outcome = "ok"
+        elapsed = time.perf_counter() - start
+        line += f" | {name} ({len(exclusions):,} pairs) {elapsed * 1000:9.2f}ms {outcome}"
+    print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-size", type=int, default=1_000_000)
+    parser.add_argument("--dense-max-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report, passed = exact_uniformity(6, 50_000, rng)
+    print(report)
+    if not passed:
+        sys.exit("Constrained draws are not uniform")
+
+    n = 10
+    while n <= args.max_size:
+        run_size(n, rng)
+        n *= 10
+
+    n = 10
+    while n <= args.dense_max_size:
+        run_dense(n, rng)
+        n *= 10
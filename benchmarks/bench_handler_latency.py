@@ -0,0 +1,109 @@
+"""
+Handler latency benchmark: blocking lookups vs AsyncDatabase
+
+Simulates many chats sending a command at the same moment. Each simulated
+update does what a typical group handler does (language lookup, group lookup,
+assignment check). The "sync" run calls the frozen BlockingDatabase baseline
+from inside the coroutine, as the handlers used to; the "async" run awaits
+AsyncDatabase, with its language cache cleared before every burst so both
+sides run the same three queries per update.
+
+Requires a reachable PostgreSQL at DATABASE_URL. Usage:
+
+    python -m benchmarks.bench_handler_latency --chats 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from bot.database import AsyncDatabase
+from benchmarks.blocking_database import BlockingDatabase
+
+# Chat ids used by the benchmark; far away from real Telegram ids
+BASE_CHAT_ID = -9_000_000_000
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of floats"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(label, latencies, elapsed):
+    """Print latency summary in milliseconds"""
+    ms = [x * 1000 for x in latencies]
+    print(
+        f"{label:>6}: {len(ms)} updates in {elapsed:.2f}s "
+        f"({len(ms) / elapsed:.0f} upd/s) | "
+        f"p50 {statistics.median(ms):.1f}ms | "
+        f"p95 {percentile(ms, 95):.1f}ms | "
+        f"p99 {percentile(ms, 99):.1f}ms | "
+        f"max {max(ms):.1f}ms"
+    )
+
+
+async def sync_update(db: BlockingDatabase, chat_id: int) -> float:
+    """Handler body using blocking lookups (stalls the event loop)"""
+    start = time.perf_counter()
+    db.get_language(chat_id)
+    db.get_group(chat_id)
+    db.is_group_assigned(chat_id)
+    await asyncio.sleep(0)  # stands in for the reply_text round trip
+    return time.perf_counter() - start
+
+
+async def async_update(db: AsyncDatabase, chat_id: int) -> float:
+    """Handler body using AsyncDatabase"""
+    start = time.perf_counter()
+    await db.get_language(chat_id)
+    await db.get_group(chat_id)
+    await db.is_group_assigned(chat_id)
+    await asyncio.sleep(0)
+    return time.perf_counter() - start
+
+
+async def run_burst(update_fn, db, chats: int):
+    """Fire one update per chat at once; latency is measured from the burst start"""
+    if isinstance(db, AsyncDatabase):
+        # Every get_language must reach PostgreSQL, as it does in the baseline
+        db.language_cache.clear()
+    burst_start = time.perf_counter()
+
+    async def timed(chat_id):
+        await update_fn(db, chat_id)
+        return time.perf_counter() - burst_start
+
+    latencies = await asyncio.gather(*(timed(BASE_CHAT_ID - i) for i in range(chats)))
+    return latencies, time.perf_counter() - burst_start
+
+
+async def main(chats: int, rounds: int):
+    # Opening AsyncDatabase brings the schema up to date
+    async_db = AsyncDatabase()
+    await async_db.open()
+    sync_db = BlockingDatabase()
+
+    try:
+        for label, update_fn, db in (("sync", sync_update, sync_db), ("async", async_update, async_db)):
+            # Warm up the pool
+            await run_burst(update_fn, db, min(chats, 20))
+            all_latencies = []
+            total = 0.0
+            for _ in range(rounds):
+                latencies, elapsed = await run_burst(update_fn, db, chats)
+                all_latencies.extend(latencies)
+                total += elapsed
+            report(label, all_latencies, total)
+    finally:
+        sync_db.close()
+        await async_db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=200, help="concurrent chats per burst")
+    parser.add_argument("--rounds", type=int, default=5, help="number of bursts")
+    args = parser.parse_args()
+    asyncio.run(main(args.chats, args.rounds))
@@ -0,0 +1,47 @@
+"""
+Markdown escaping micro-benchmark
+
+Compares the old 18-pass str.replace escaper with the single-pass
+regex escapers in bot.markdown on realistic first names, usernames and
+long wishes.
+
+    python -m benchmarks.bench_markdown
+"""
+import timeit
+
+from bot.markdown import escape_markdown, escape_markdown_v2
+
+NAMES = ["Alice", "Дмитрий", "Jean-Luc", "anna_k", "Mr. Smith", "🎅 Santa!", "O'Brien", "李雷"]
+USERNAMES = ["alice_1990", "dmitry", "jean_luc_p", "anna.k", "smith", "santa_claus_", "obrien", "li_lei"]
+WISHES = [
+    "Хотел бы книгу или кружку для кофе! Можно что-нибудь из серии \"Гарри Поттер\" (любая часть).",
+    "Anything from my wishlist: [link] https://example.com/list?id=42 - or a nice *scarf* (blue, not red!)",
+    "Board games > everything. Budget ~50. #boardgames #gifts",
+] * 10
+
+
+def replace_escape(text: str) -> str:
+    """The escaper previously copy-pasted into every handler module"""
+    if not text:
+        return text
+    special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
+    for char in special_chars:
+        text = text.replace(char, '\\' + char)
+    return text
+
+
+def run(label: str, texts, number: int) -> None:
+    results = {}
+    for name, fn in (("replace x18", replace_escape), ("markdown", escape_markdown), ("markdown_v2", escape_markdown_v2)):
+        seconds = min(timeit.repeat(lambda: [fn(t) for t in texts], number=number, repeat=5))
+        results[name] = seconds / (number * len(texts)) * 1e9
+    baseline = results["replace x18"]
+    print(f"{label:>10}: " + " | ".join(
+        f"{name} {ns:7.0f} ns ({baseline / ns:4.1f}x)" for name, ns in results.items()
+    ))
+
+
+if __name__ == "__main__":
+    run("names", NAMES, 20000)
+    run("usernames", USERNAMES, 20000)
+    run("wishes", WISHES, 2000)
@@ -0,0 +1,126 @@
+"""
+Prepared statement and pipeline benchmark for AsyncDatabase
+
+Calls each hot lookup sequentially against a fixture group, once per
+prepare mode of AsyncDatabase:
+
+* off  - prepare=False, every call is parsed and planned again
+* auto - prepare=None, psycopg prepares after prepare_threshold (5) uses
+* on   - prepare=True, prepared on first use per connection (the default)
+
+It then compares update_group_settings' two UPDATEs sent one after another
+with the same statements in pipeline mode. The language cache is cleared
+before every get_language call, so the query always reaches PostgreSQL.
+
+Requires a reachable PostgreSQL at DATABASE_URL. Usage:
+
+    python -m benchmarks.bench_prepared --calls 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from bot.database import AsyncDatabase
+from benchmarks.bench_handler_latency import percentile
+
+# Fixture ids; far away from real Telegram ids
+GROUP_ID = -9_100_000_000
+USER_IDS = range(9_100_000_000, 9_100_000_020)
+
+
+async def create_fixture(db: AsyncDatabase) -> None:
+    await db.create_group(GROUP_ID, USER_IDS[0], "Benchmark")
+    for user_id in USER_IDS:
+        await db.add_participant(GROUP_ID, user_id, f"user{user_id}", "Bench")
+    await db.assign_secret_santas(GROUP_ID)
+
+
+async def drop_fixture(db: AsyncDatabase) -> None:
+    async with db.get_connection() as conn:
+        await conn.execute("DELETE FROM groups WHERE group_id = %s", (GROUP_ID,))
+        await conn.commit()
+
+
+def hot_calls(db: AsyncDatabase):
+    """(name, zero-argument coroutine factory) for each hot lookup"""
+    user_id = USER_IDS[1]
+
+    async def get_language():
+        db.language_cache.clear()
+        return await db.get_language(GROUP_ID)
+
+    return [
+        ("get_language", get_language),
+        ("get_group", lambda: db.get_group(GROUP_ID)),
+        ("is_group_assigned", lambda: db.is_group_assigned(GROUP_ID)),
+        ("get_assignment", lambda: db.get_assignment(GROUP_ID, user_id)),
+        ("get_secret_santa_for_user", lambda: db.get_secret_santa_for_user(GROUP_ID, user_id)),
+        ("get_user_dashboard", lambda: db.get_user_dashboard(user_id)),
+    ]
+
+
+async def measure(call, calls: int):
+    """Per-call latencies in milliseconds"""
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def sequential_updates(db: AsyncDatabase):
+    async with db.get_connection() as conn:
+        await conn.execute("UPDATE groups SET event_date = %s WHERE group_id = %s", ("2030-12-24", GROUP_ID))
+        await conn.execute("UPDATE groups SET max_price = %s WHERE group_id = %s", (50, GROUP_ID))
+        await conn.commit()
+
+
+async def pipelined_updates(db: AsyncDatabase):
+    await db.update_group_settings(GROUP_ID, event_date="2030-12-24", max_price=50)
+
+
+async def main(calls: int):
+    results = {}
+    for label, prepare in (("off", False), ("auto", None), ("on", True)):
+        db = AsyncDatabase(prepare=prepare)
+        await db.open()
+        try:
+            if label == "off":
+                await create_fixture(db)
+            for name, call in hot_calls(db):
+                await measure(call, 20)  # warm up every pooled connection
+                results[(name, label)] = await measure(call, calls)
+        finally:
+            await db.close()
+
+    print(f"{'lookup':<26} {'mode':>4} {'mean':>8} {'p50':>8} {'p99':>8}")
+    for (name, label), ms in results.items():
+        print(
+            f"{name:<26} {label:>4} {statistics.mean(ms):7.3f}ms {statistics.median(ms):7.3f}ms "
+            f"{percentile(ms, 99):7.3f}ms"
+        )
+
+    db = AsyncDatabase()
+    await db.open()
+    try:
+        print()
+        for label, call in (("sequential", lambda: sequential_updates(db)),
+                            ("pipeline", lambda: pipelined_updates(db))):
+            await measure(call, 20)
+            ms = await measure(call, calls)
+            print(
+                f"update_group_settings {label:>10}: mean {statistics.mean(ms):.3f}ms | "
+                f"p50 {statistics.median(ms):.3f}ms | p99 {percentile(ms, 99):.3f}ms"
+            )
+    finally:
+        await drop_fixture(db)
+        await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000, help="calls per lookup and mode")
+    args = parser.parse_args()
+    asyncio.run(main(args.calls))
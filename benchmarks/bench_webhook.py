@@ -0,0 +1,115 @@
+"""
+Webhook endpoint throughput test
+
+Starts the embedded WebhookServer in-process on a local port, posts synthetic
+Telegram updates to it over keep-alive HTTP connections (a raw asyncio
+client, so client overhead doesn't dominate) and measures requests per
+second and latency. It also checks that requests with a wrong secret are
+rejected and that every accepted update reaches the update queue. No
+Telegram or database access is needed.
+
+    python -m benchmarks.bench_webhook --updates 20000 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from telegram.ext import Application
+
+from bot.webhook import WebhookServer
+
+SECRET = "benchmark-secret"
+
+
+def synthetic_update(update_id: int) -> bytes:
+    """A private text message; no handler replies to it, so nothing leaves the process"""
+    user = {"id": 100000 + update_id % 5000, "is_bot": False, "first_name": "Bench"}
+    return json.dumps({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user["id"], "type": "private", "first_name": "Bench"},
+            "from": user,
+            "text": "hello",
+        },
+    }).encode()
+
+
+async def main(updates: int, concurrency: int, port: int) -> None:
+    application = Application.builder().token("123456:BENCHMARK").build()
+    server = WebhookServer(application, "127.0.0.1", port, "telegram", SECRET)
+    await server.start()
+    url = f"http://127.0.0.1:{port}/telegram"
+
+    drained = 0
+
+    async def drain():
+        nonlocal drained
+        while True:
+            await application.update_queue.get()
+            drained += 1
+
+    drainer = asyncio.create_task(drain())
+
+    async def post(reader, writer, body: bytes, secret: str = SECRET) -> int:
+        """Send one keep-alive POST and return the status code"""
+        writer.write(
+            f"POST /telegram HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+            f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        return int(head.split(b" ", 2)[1])
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    status = await post(reader, writer, synthetic_update(0), secret="nope")
+    assert status == 403, f"wrong secret returned {status}"
+    writer.close()
+
+    queue = asyncio.Queue()
+    for i in range(1, updates + 1):
+        queue.put_nowait(i)
+    latencies = []
+
+    async def worker():
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            while not queue.empty():
+                update_id = queue.get_nowait()
+                body = synthetic_update(update_id)
+                start = time.perf_counter()
+                status = await post(reader, writer, body)
+                latencies.append(time.perf_counter() - start)
+                assert status == 200, status
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    await asyncio.sleep(0.1)
+    drainer.cancel()
+    await server.stop()
+
+    ms = sorted(x * 1000 for x in latencies)
+    print(
+        f"{updates} updates, concurrency {concurrency}: {elapsed:.2f}s "
+        f"({updates / elapsed:.0f} req/s) | p50 {statistics.median(ms):.2f}ms | "
+        f"p99 {ms[int(len(ms) * 0.99) - 1]:.2f}ms | queued {drained}/{updates} | "
+        f"rejected {server.rejected}"
+    )
+    assert drained == updates, "some accepted updates never reached the queue"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=18443)
+    args = parser.parse_args()
+    asyncio.run(main(args.updates, args.concurrency, args.port))
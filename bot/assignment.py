@@ -0,0 +1,426 @@
+"""
+Secret Santa assignment engine
+
+Produces the giver -> receiver permutation for a draw. The unconstrained
+draw is a uniformly random derangement generated in a single O(n) pass
+(Martínez, Panholzer & Prodinger, "Generating random derangements", 2008).
+
+Exclusions turn the draw into a perfect matching problem on the bipartite
+graph of allowed (giver, receiver) pairs. That graph is the complement of
+the exclusions, so it is never built. The derangement's allowed pairs are
+kept, the remaining givers are matched greedily at random, and whoever is
+still unmatched is handled by Hopcroft-Karp phases (Hopcroft & Karp, 1973)
+over the free givers in random order, with every neighbour set computed as
+a set difference against the exclusions. The matching is random but not
+uniform over the valid draws.
+
+When no perfect matching exists, the failed search yields a Hall witness:
+a set of givers whose allowed receivers are fewer than they are. It is
+raised as Infeasible so the admin can see what to change.
+
+Pairs that should only be avoided (earlier seasons' draws) are tried as
+exclusions first and dropped together if they make the draw infeasible.
+
+Constraints are first met by rejection: up to REJECTION_ATTEMPTS uniform
+derangements are drawn and the first one that breaks no rule is kept, so
+whenever the constraints are loose (a few exclusions, no 2-cycles) the
+result is uniform over the valid draws. Only when all of them fail does the
+matching solver run, followed for the no-2-cycle rule by random swaps, and
+for groups of up to SEARCH_MAX_SIZE by a backtracking search that, within
+SEARCH_STEPS, either finds a draw or proves there is none. Larger groups
+that defeat the swaps get an AssignmentError: there the rule is best-effort.
+"""
+import random
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Uniform derangements tried before falling back to the matching solver
+REJECTION_ATTEMPTS = 16
+# Random partners tried before a violating giver is declared unrepairable
+REPAIR_ATTEMPTS = 64
+# Matching-and-swap rounds tried before the exhaustive search
+REPAIR_ROUNDS = 8
+# Groups up to this size get an exhaustive search when random swaps fail
+SEARCH_MAX_SIZE = 64
+# Partial draws the exhaustive search may visit before giving up
+SEARCH_STEPS = 10000
+# Random tries a giver gets in the greedy pass before it is left to augmenting paths
+GREEDY_ATTEMPTS = 16
+
+
+class AssignmentError(ValueError):
+    """Raised when no assignment satisfying the constraints could be found"""
+
+
+class Infeasible(AssignmentError):
+    """No assignment exists: every one of givers must draw from receivers, and there are too few"""
+
+    def __init__(self, givers: List[Hashable], receivers: List[Hashable]):
+        super().__init__(
+            f"No valid assignment: {len(givers)} participants can only draw "
+            f"from {len(receivers)} others"
+        )
+        self.givers = givers
+        self.receivers = receivers
+
+
+def _pair_probabilities(n: int) -> List[float]:
+    """
+    Probability that the swap at step u closes a 2-cycle, for u = 0..n.
+
+    q[u] = (u - 1) * D(u - 2) / D(u), where D are the derangement numbers.
+    Computed through the ratio r[u] = D(u - 1) / D(u) so it stays a float
+    for any n.
+    """
+    q = [0.0] * (n + 1)
+    if n >= 2:
+        q[2] = 1.0
+    ratio = 0.0  # r[2] = D(1) / D(2)
+    for u in range(3, n + 1):
+        prev = ratio
+        ratio = 1.0 / ((u - 1) * (1.0 + prev))
+        q[u] = (u - 1) * ratio * prev
+    return q
+
+
+def random_derangement(n: int, rng: Optional[random.Random] = None) -> List[int]:
+    """Return a uniformly random derangement of range(n) in expected O(n) time"""
+    if n < 2:
+        raise AssignmentError("A derangement needs at least 2 items")
+
+    rng = rng or random
+    randrange = rng.randrange
+    rand = rng.random
+    q = _pair_probabilities(n)
+
+    perm = list(range(n))
+    marked = [False] * n
+    unmarked = n
+    i = n - 1
+    while unmarked >= 2:
+        if not marked[i]:
+            j = randrange(i)
+            while marked[j]:
+                j = randrange(i)
+            perm[i], perm[j] = perm[j], perm[i]
+            if rand() < q[unmarked]:
+                marked[j] = True
+                unmarked -= 1
+            unmarked -= 1
+        i -= 1
+    return perm
+
+
+def _index_exclusions(index: Dict[Hashable, int],
+                      exclusions: Iterable[Tuple[Hashable, Hashable]]) -> Optional[List[Set[int]]]:
+    """Translate (giver, receiver) id pairs into per-giver sets of receiver indexes; None if there are none"""
+    banned: Optional[List[Set[int]]] = None
+    for giver, receiver in exclusions:
+        g = index.get(giver)
+        r = index.get(receiver)
+        if g is not None and r is not None:
+            if banned is None:
+                banned = [set() for _ in range(len(index))]
+            banned[g].add(r)
+    return banned
+
+
+def _reachable(giver: int, receivers: Set[int], banned: List[Set[int]]) -> Set[int]:
+    """The receivers of a set that giver may draw (one C-level set difference)"""
+    reachable = receivers - banned[giver]
+    reachable.discard(giver)
+    return reachable
+
+
+def _layers(free: List[int], match_r: List[int], banned: List[Set[int]]) -> Optional[List[Set[int]]]:
+    """
+    Hopcroft-Karp BFS: receiver layers from the free givers up to the first
+    layer holding a free receiver, or None when no augmenting path exists.
+    """
+    unvisited = set(range(len(match_r)))
+    frontier = free
+    layers = []
+    while frontier:
+        layer: Set[int] = set()
+        for giver in frontier:
+            reachable = _reachable(giver, unvisited, banned)
+            unvisited -= reachable
+            layer |= reachable
+        if not layer:
+            return None
+        layers.append(layer)
+        if any(match_r[r] < 0 for r in layer):
+            return layers
+        frontier = [match_r[r] for r in layer]
+    return None
+
+
+def _augment(root: int, layers: List[Set[int]], match_g: List[int], match_r: List[int],
+             banned: List[Set[int]]) -> bool:
+    """
+    Hopcroft-Karp DFS: find a shortest augmenting path from root through the
+    layers and flip it. Receivers are removed from their layer once tried,
+    so the paths found in one phase are vertex-disjoint.
+    """
+    last = len(layers) - 1
+    givers = [root]
+    path: List[int] = []
+    stack = [iter(_reachable(root, layers[0], banned))]
+    while stack:
+        depth = len(stack) - 1
+        for receiver in stack[-1]:
+            if receiver not in layers[depth]:
+                continue
+            layers[depth].discard(receiver)
+            if depth < last:
+                path.append(receiver)
+                givers.append(match_r[receiver])
+                stack.append(iter(_reachable(givers[-1], layers[depth + 1], banned)))
+                break
+            if match_r[receiver] < 0:
+                path.append(receiver)
+                for giver, taken in zip(givers, path):
+                    match_g[giver] = taken
+                    match_r[taken] = giver
+                return True
+        else:
+            stack.pop()
+            givers.pop()
+            if path:
+                path.pop()
+    return False
+
+
+def _hall_witness(root: int, match_r: List[int], banned: List[Set[int]]) -> Tuple[Set[int], Set[int]]:
+    """
+    Givers reachable from a free giver that has no augmenting path, and the
+    receivers they may draw; all of those are matched, so there is one
+    receiver fewer than givers.
+    """
+    unvisited = set(range(len(match_r)))
+    givers = {root}
+    receivers: Set[int] = set()
+    frontier = [root]
+    while frontier:
+        reached = []
+        for giver in frontier:
+            reachable = _reachable(giver, unvisited, banned)
+            unvisited -= reachable
+            receivers |= reachable
+            reached.extend(match_r[r] for r in reachable)
+        givers.update(reached)
+        frontier = reached
+    return givers, receivers
+
+
+def _match(perm: List[int], banned: List[Set[int]], rng) -> List[int]:
+    """Turn a derangement into a perfect matching that avoids the banned receivers"""
+    n = len(perm)
+
+    # Keep every allowed pair of the random derangement
+    match_g = [-1] * n
+    match_r = [-1] * n
+    for giver, receiver in enumerate(perm):
+        if receiver not in banned[giver]:
+            match_g[giver] = receiver
+            match_r[receiver] = giver
+
+    # Greedy: each unmatched giver tries a few random free receivers; when
+    # one is excluded, it tries to take a random receiver whose giver can
+    # move to that free receiver instead (an augmenting path of length 3)
+    free_givers = [g for g in range(n) if match_g[g] < 0]
+    free_receivers = [r for r in range(n) if match_r[r] < 0]
+    position = {r: k for k, r in enumerate(free_receivers)}
+    rng.shuffle(free_givers)
+    for giver in free_givers:
+        excluded = banned[giver]
+        for _ in range(GREEDY_ATTEMPTS):
+            free = free_receivers[rng.randrange(len(free_receivers))]
+            if free != giver and free not in excluded:
+                receiver = free
+            else:
+                receiver = rng.randrange(n)
+                other = match_r[receiver]
+                if receiver == giver or receiver in excluded or other < 0 or free == other or free in banned[other]:
+                    continue
+                match_g[other] = free
+                match_r[free] = other
+            # Take free off the free list
+            last = free_receivers.pop()
+            if last != free:
+                free_receivers[position[free]] = last
+                position[last] = position[free]
+            match_g[giver] = receiver
+            match_r[receiver] = giver
+            break
+
+    # Hopcroft-Karp phases for the rest
+    while True:
+        free_givers = [g for g in range(n) if match_g[g] < 0]
+        if not free_givers:
+            return match_g
+        rng.shuffle(free_givers)
+        layers = _layers(free_givers, match_r, banned)
+        if layers is None:
+            givers, receivers = _hall_witness(free_givers[0], match_r, banned)
+            raise Infeasible(sorted(givers), sorted(receivers))
+        for giver in free_givers:
+            _augment(giver, layers, match_g, match_r, banned)
+
+
+def _repair(perm: List[int], banned: Optional[List[Set[int]]], allow_two_cycles: bool,
+            rng) -> None:
+    """Swap receivers until every giver satisfies the constraints (in place)"""
+    n = len(perm)
+    randrange = rng.randrange
+
+    def valid(giver: int, receiver: int) -> bool:
+        if giver == receiver or (banned and receiver in banned[giver]):
+            return False
+        # perm[receiver] is read after the swap, so this sees the new edges
+        return allow_two_cycles or perm[receiver] != giver
+
+    for i in range(n):
+        if valid(i, perm[i]):
+            continue
+        for _ in range(REPAIR_ATTEMPTS):
+            j = randrange(n)
+            if j == i:
+                continue
+            perm[i], perm[j] = perm[j], perm[i]
+            if valid(i, perm[i]) and valid(j, perm[j]):
+                break
+            perm[i], perm[j] = perm[j], perm[i]
+        else:
+            raise AssignmentError(f"Could not satisfy constraints for participant at position {i}")
+
+
+def _satisfies(perm: List[int], banned: Optional[List[Set[int]]], allow_two_cycles: bool) -> bool:
+    """Whether a derangement avoids the banned receivers and, if required, 2-cycles"""
+    if banned:
+        for giver, receiver in enumerate(perm):
+            if receiver in banned[giver]:
+                return False
+    if not allow_two_cycles:
+        for giver, receiver in enumerate(perm):
+            if perm[receiver] == giver:
+                return False
+    return True
+
+
+def _search(n: int, banned: Optional[List[Set[int]]], rng) -> Optional[List[int]]:
+    """
+    Exhaustive backtracking for a derangement without 2-cycles that avoids
+    the banned receivers; None if there is none. Always extends the giver
+    with the fewest receivers left, trying them in random order. Raises
+    AssignmentError after SEARCH_STEPS partial draws.
+    """
+    options = []
+    for giver in range(n):
+        allowed = [r for r in range(n) if r != giver and not (banned and r in banned[giver])]
+        rng.shuffle(allowed)
+        options.append(allowed)
+    perm = [-1] * n
+    taken = [False] * n
+    steps = 0
+
+    def extend(assigned: int) -> bool:
+        nonlocal steps
+        if assigned == n:
+            return True
+        steps += 1
+        if steps > SEARCH_STEPS:
+            raise AssignmentError("Could not find an assignment without 2-cycles (search limit reached)")
+        best, best_choices = -1, None
+        for giver in range(n):
+            if perm[giver] >= 0:
+                continue
+            choices = [r for r in options[giver] if not taken[r] and perm[r] != giver]
+            if not choices:
+                return False
+            if best_choices is None or len(choices) < len(best_choices):
+                best, best_choices = giver, choices
+        for receiver in best_choices:
+            perm[best] = receiver
+            taken[receiver] = True
+            if extend(assigned + 1):
+                return True
+            perm[best] = -1
+            taken[receiver] = False
+        return False
+
+    return perm if extend(0) else None
+
+
+def draw(
+    ids: Sequence[Hashable],
+    exclusions: Iterable[Tuple[Hashable, Hashable]] = (),
+    allow_two_cycles: bool = True,
+    rng: Optional[random.Random] = None,
+    avoid: Iterable[Tuple[Hashable, Hashable]] = (),
+) -> List[Hashable]:
+    """
+    Draw a receiver for every id so that nobody gets themselves.
+
+    Args:
+        ids: Participant ids (givers), must be unique
+        exclusions: Forbidden (giver, receiver) pairs. For "these two must
+            not draw each other" pass both (a, b) and (b, a).
+        allow_two_cycles: If False, no two participants draw each other.
+            Exact for groups of up to SEARCH_MAX_SIZE (within SEARCH_STEPS),
+            best-effort above
+        rng: Random source (defaults to the random module)
+        avoid: (giver, receiver) pairs excluded only if a draw avoiding
+            them and the exclusions exists; otherwise all of them are ignored
+
+    Returns:
+        Receivers aligned with ids: ids[k] gives to result[k]
+
+    Raises:
+        Infeasible: If no assignment avoids the exclusions; lists a set of
+            givers and the fewer receivers they are limited to
+        AssignmentError: If no assignment without 2-cycles exists, or none
+            was found in a group larger than SEARCH_MAX_SIZE
+    """
+    rng = rng or random
+    avoid = list(avoid)
+    if avoid:
+        exclusions = list(exclusions)
+        try:
+            return draw(ids, exclusions + avoid, allow_two_cycles, rng)
+        except AssignmentError:
+            pass
+
+    n = len(ids)
+    if not allow_two_cycles and n < 3:
+        raise AssignmentError("Avoiding 2-cycles needs at least 3 participants")
+
+    index = {item: k for k, item in enumerate(ids)}
+    banned = _index_exclusions(index, exclusions)
+
+    # Rejection: uniform over the valid draws when it succeeds
+    for _ in range(REJECTION_ATTEMPTS):
+        perm = random_derangement(n, rng)
+        if _satisfies(perm, banned, allow_two_cycles):
+            return [ids[k] for k in perm]
+
+    for _ in range(REPAIR_ROUNDS):
+        if banned:
+            try:
+                perm = _match(perm, banned, rng)
+            except Infeasible as e:
+                raise Infeasible([ids[k] for k in e.givers], [ids[k] for k in e.receivers]) from None
+        if allow_two_cycles:
+            return [ids[k] for k in perm]
+        try:
+            # Swaps that keep the exclusions satisfied
+            _repair(perm, banned, allow_two_cycles, rng)
+            return [ids[k] for k in perm]
+        except AssignmentError:
+            perm = random_derangement(n, rng)
+
+    if n > SEARCH_MAX_SIZE:
+        raise AssignmentError(f"Could not find an assignment without 2-cycles for {n} participants")
+    perm = _search(n, banned, rng)
+    if perm is None:
+        raise AssignmentError("No valid assignment: the exclusions force two participants to draw each other")
+    return [ids[k] for k in perm]
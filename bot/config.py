@@ -2,6 +2,7 @@
 Configuration module for Secret Santa Bot
 """
 import os
+from typing import List, Optional
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -14,3 +15,178 @@ def get_bot_token() -> str:
     if not token:
         raise ValueError("BOT_TOKEN not found in environment variables!")
     return token
+
+
+def get_bot_mode() -> str:
+    """Get how the bot receives updates: 'polling' (default) or 'webhook'"""
+    mode = os.getenv("BOT_MODE", "polling").strip().lower()
+    if mode not in ("polling", "webhook"):
+        raise ValueError(f"BOT_MODE must be 'polling' or 'webhook', got '{mode}'")
+    return mode
+
+
+def get_webhook_config() -> dict:
+    """
+    Get webhook server settings from environment variables.
+
+    WEBHOOK_SECRET is required: Telegram echoes it in the
+    X-Telegram-Bot-Api-Secret-Token header and requests without it are rejected.
+    WEBHOOK_URL is the public URL registered with Telegram on startup; leave it
+    unset on extra instances behind a load balancer so only one of them calls
+    setWebhook.
+    """
+    secret = os.getenv("WEBHOOK_SECRET")
+    if not secret:
+        raise ValueError("WEBHOOK_SECRET not found in environment variables!")
+
+    return {
+        "listen": os.getenv("WEBHOOK_LISTEN", "0.0.0.0"),
+        "port": int(os.getenv("WEBHOOK_PORT", "8443")),
+        "url_path": os.getenv("WEBHOOK_PATH", "telegram").strip("/"),
+        "webhook_url": os.getenv("WEBHOOK_URL") or None,
+        "secret_token": secret,
+    }
+
+
+def get_storage_backend() -> str:
+    """Get the storage backend: 'postgres' (default), 'sqlite' or 'memory'"""
+    backend = os.getenv("STORAGE_BACKEND", "postgres").strip().lower()
+    if backend not in ("postgres", "sqlite", "memory"):
+        raise ValueError(f"STORAGE_BACKEND must be 'postgres', 'sqlite' or 'memory', got '{backend}'")
+    return backend
+
+
+def get_database_prepare() -> Optional[bool]:
+    """
+    Get when PostgreSQL statements are prepared server-side (DATABASE_PREPARE):
+    'on' (default) prepares the hot lookups on first use, 'auto' leaves it to
+    psycopg's prepare_threshold, 'off' never prepares, as PgBouncer in
+    transaction mode requires.
+    """
+    mode = os.getenv("DATABASE_PREPARE", "on").strip().lower()
+    modes = {"on": True, "auto": None, "off": False}
+    if mode not in modes:
+        raise ValueError(f"DATABASE_PREPARE must be 'on', 'auto' or 'off', got '{mode}'")
+    return modes[mode]
+
+
+def get_message_rate() -> float:
+    """
+    Get how many direct messages per second this instance may send
+    (MESSAGES_PER_SECOND, default 25). Telegram's limit of about 30 per second
+    is per bot, so instances behind a load balancer must split it between them;
+    WORKERS then divides each instance's rate between its workers.
+    """
+    rate = float(os.getenv("MESSAGES_PER_SECOND", "25"))
+    if rate <= 0:
+        raise ValueError(f"MESSAGES_PER_SECOND must be positive, got {rate}")
+    return rate
+
+
+def get_cache_ttl() -> Optional[float]:
+    """
+    Get the longest time in seconds an in-process cache (group languages,
+    titles, admin rights) may keep an entry (CACHE_TTL), or None to keep each
+    cache's own TTL. The caches are per process and are not invalidated across
+    instances behind a load balancer, so lower this when several instances run;
+    0 disables them.
+    """
+    ttl = os.getenv("CACHE_TTL")
+    if not ttl:
+        return None
+    ttl = float(ttl)
+    if ttl < 0:
+        raise ValueError(f"CACHE_TTL must not be negative, got {ttl}")
+    return ttl
+
+
+def get_sqlite_path() -> str:
+    """Get the SQLite database file used by the sqlite storage backend"""
+    return os.getenv("SQLITE_PATH", "secretsanta.db")
+
+
+def get_metrics_config() -> Optional[dict]:
+    """
+    Get the metrics endpoint settings, or None when METRICS_PORT is unset.
+
+    The endpoint listens on 127.0.0.1 unless METRICS_LISTEN says otherwise,
+    so it is only reachable by a scraper on the same host or network namespace.
+    """
+    port = os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    return {
+        "listen": os.getenv("METRICS_LISTEN", "127.0.0.1"),
+        "port": int(port),
+    }
+
+
+def get_tracing_config() -> dict:
+    """
+    Get the per-update database tracing thresholds.
+
+    A statement slower than SLOW_QUERY_MS is logged on its own; an update is
+    logged with its statement breakdown when it runs at least
+    SLOW_UPDATE_QUERIES statements or spends SLOW_UPDATE_DB_MS in the database.
+    """
+    return {
+        "slow_query_ms": float(os.getenv("SLOW_QUERY_MS", "100")),
+        "max_queries": int(os.getenv("SLOW_UPDATE_QUERIES", "10")),
+        "max_db_ms": float(os.getenv("SLOW_UPDATE_DB_MS", "250")),
+    }
+
+
+def get_update_concurrency() -> int:
+    """
+    Get how many updates are handled at once (UPDATE_CONCURRENCY, default 32).
+
+    Updates from the same chat always run one at a time, in order.
+    """
+    concurrency = int(os.getenv("UPDATE_CONCURRENCY", "32"))
+    if concurrency < 1:
+        raise ValueError(f"UPDATE_CONCURRENCY must be at least 1, got {concurrency}")
+    return concurrency
+
+
+def get_worker_count() -> int:
+    """
+    Get the number of worker processes (WORKERS, default 1).
+
+    With more than one, this process only receives updates and hands each
+    chat's updates to the same worker; every worker has its own pool.
+    """
+    workers = int(os.getenv("WORKERS", "1"))
+    if workers < 1:
+        raise ValueError(f"WORKERS must be at least 1, got {workers}")
+    return workers
+
+
+def get_reminder_days() -> List[int]:
+    """
+    Get how many days before the event date groups are reminded
+    (REMINDER_DAYS, default "7,3,1,0"; empty disables reminders).
+    """
+    value = os.getenv("REMINDER_DAYS", "7,3,1,0")
+    try:
+        days = sorted({int(day) for day in value.split(",") if day.strip()}, reverse=True)
+    except ValueError:
+        raise ValueError(f"REMINDER_DAYS must be a comma-separated list of days, got '{value}'")
+    if any(day < 0 for day in days):
+        raise ValueError(f"REMINDER_DAYS must not be negative, got '{value}'")
+    return days
+
+
+def get_history_policy() -> dict:
+    """
+    Get how earlier seasons' pairs constrain a new draw: the last
+    HISTORY_SEASONS seasons (default 1; 0 ignores history), treated as
+    HISTORY_EXCLUSIONS "soft" (default; dropped when they leave no valid
+    draw) or "hard" exclusions.
+    """
+    seasons = int(os.getenv("HISTORY_SEASONS", "1"))
+    if seasons < 0:
+        raise ValueError(f"HISTORY_SEASONS must not be negative, got {seasons}")
+    mode = os.getenv("HISTORY_EXCLUSIONS", "soft").strip().lower()
+    if mode not in ("soft", "hard"):
+        raise ValueError(f"HISTORY_EXCLUSIONS must be 'soft' or 'hard', got '{mode}'")
+    return {"history_seasons": seasons, "history_hard": mode == "hard"}
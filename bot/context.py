@@ -0,0 +1,32 @@
+"""
+Handler context for Secret Santa Bot
+"""
+from telegram.ext import CallbackContext, ExtBot
+
+from bot.cache import TTLCache
+from bot.outbox import OutboxWorker
+from bot.storage import Storage
+
+
+class BotContext(CallbackContext[ExtBot, dict, dict, dict]):
+    """CallbackContext with shortcuts to the resources created in post_init"""
+
+    @property
+    def db(self) -> Storage:
+        """The opened storage backend"""
+        return self.application.bot_data["db"]
+
+    @property
+    def admin_cache(self) -> TTLCache:
+        """(chat_id, user_id) -> is admin"""
+        return self.application.bot_data["admin_cache"]
+
+    @property
+    def outbox(self) -> OutboxWorker:
+        """Delivers queued direct messages; wake() it after queueing some"""
+        return self.application.bot_data["outbox"]
+
+    @property
+    def history_policy(self) -> dict:
+        """assign_secret_santas keyword arguments for earlier seasons' pairs"""
+        return self.application.bot_data.get("history_policy", {})
@@ -4,44 +4,35 @@ Admin command handlers for Secret Santa Bot
 import logging
 from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
-from bot.utils import get_lang, db
+from bot.context import BotContext
+from bot.utils import get_lang, is_admin
 from bot.translations import get_text
+from bot.markdown import escape_markdown
+from bot.messages import assignment_message, exclusions_message, infeasible_message, participant_names
+from bot.assignment import Infeasible
 
 logger = logging.getLogger(__name__)
 
 
-def escape_markdown(text: str) -> str:
-    """Escape special Markdown characters to prevent parsing errors."""
-    if not text:
-        return text
-    # Escape Markdown special characters
-    special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-    for char in special_chars:
-        text = text.replace(char, '\\' + char)
-    return text
-
-
-async def setup(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def setup(update: Update, context: BotContext) -> None:
     """Set up Secret Santa in a group (admin only)."""
     chat = update.effective_chat
     user = update.effective_user
-    lang = get_lang(chat.id)
+    lang = await get_lang(context, chat.id)
 
     if chat.type == "private":
         await update.message.reply_text(get_text(lang, "setup_private_only"))
         return
 
     # Check if user is admin
-    member = await chat.get_member(user.id)
-    if member.status not in ["creator", "administrator"]:
+    if not await is_admin(context, chat.id, user.id):
         await update.message.reply_text(get_text(lang, "setup_admin_only"))
         return
 
     # Create group in database
-    if db.create_group(chat.id, user.id):
+    if await context.db.create_group(chat.id, user.id, chat.title):
         logger.info(
             f"🎄 New Secret Santa group created | "
             f"Group: {chat.id} ({chat.title}) | "
@@ -64,24 +55,23 @@ async def setup(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text(get_text(lang, "setup_error"))
 
 
-async def set_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def set_date(update: Update, context: BotContext) -> None:
     """Set the event date for Secret Santa."""
     chat = update.effective_chat
     user = update.effective_user
-    lang = get_lang(chat.id)
+    lang = await get_lang(context, chat.id)
 
     if chat.type == "private":
         await update.message.reply_text(get_text(lang, "setdate_group_only"))
         return
 
     # Check if user is admin
-    member = await chat.get_member(user.id)
-    if member.status not in ["creator", "administrator"]:
+    if not await is_admin(context, chat.id, user.id):
         await update.message.reply_text(get_text(lang, "setdate_admin_only"))
         return
 
     # Check if group exists
-    group = db.get_group(chat.id)
+    group = await context.db.get_group(chat.id)
     if not group:
         await update.message.reply_text(get_text(lang, "setdate_setup_first"))
         return
@@ -94,7 +84,7 @@ async def set_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     date_str = context.args[0]
     try:
         datetime.strptime(date_str, "%Y-%m-%d")
-        if db.update_group_settings(chat.id, event_date=date_str):
+        if await context.db.update_group_settings(chat.id, event_date=date_str):
             logger.info(
                 f"📅 Event date set | "
                 f"Group: {chat.id} | "
@@ -109,27 +99,26 @@ async def set_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text(get_text(lang, "setdate_invalid_format"))
 
 
-async def set_price(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def set_price(update: Update, context: BotContext) -> None:
     """Set the maximum gift price."""
     if not update.effective_message:
         return
 
     chat = update.effective_chat
     user = update.effective_user
-    lang = get_lang(chat.id)
+    lang = await get_lang(context, chat.id)
 
     if chat.type == "private":
         await update.effective_message.reply_text(get_text(lang, "setprice_group_only"))
         return
 
     # Check if user is admin
-    member = await chat.get_member(user.id)
-    if member.status not in ["creator", "administrator"]:
+    if not await is_admin(context, chat.id, user.id):
         await update.effective_message.reply_text(get_text(lang, "setprice_admin_only"))
         return
 
     # Check if group exists
-    group = db.get_group(chat.id)
+    group = await context.db.get_group(chat.id)
     if not group:
         await update.effective_message.reply_text(get_text(lang, "setprice_setup_first"))
         return
@@ -145,7 +134,7 @@ async def set_price(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             await update.effective_message.reply_text(get_text(lang, "setprice_positive"))
             return
 
-        if db.update_group_settings(chat.id, max_price=price):
+        if await context.db.update_group_settings(chat.id, max_price=price):
             logger.info(
                 f"💰 Max price set | "
                 f"Group: {chat.id} | "
@@ -160,35 +149,34 @@ async def set_price(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.effective_message.reply_text(get_text(lang, "setprice_invalid"))
 
 
-async def assign(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def assign(update: Update, context: BotContext) -> None:
     """Show button to assign Secret Santas (admin only)."""
     chat = update.effective_chat
     user = update.effective_user
-    lang = get_lang(chat.id)
+    lang = await get_lang(context, chat.id)
 
     if chat.type == "private":
         await update.message.reply_text(get_text(lang, "assign_group_only"))
         return
 
     # Check if user is admin
-    member = await chat.get_member(user.id)
-    if member.status not in ["creator", "administrator"]:
+    if not await is_admin(context, chat.id, user.id):
         await update.message.reply_text(get_text(lang, "assign_admin_only"))
         return
 
     # Check if group exists
-    group = db.get_group(chat.id)
+    group = await context.db.get_group(chat.id)
     if not group:
         await update.message.reply_text(get_text(lang, "assign_setup_first"))
         return
 
     # Check if already assigned
-    if db.is_group_assigned(chat.id):
+    if await context.db.is_group_assigned(chat.id):
         await update.message.reply_text(get_text(lang, "assign_already_assigned"))
         return
 
     # Check minimum participants
-    parts = db.get_participants(chat.id)
+    parts = await context.db.get_participants(chat.id)
     if len(parts) < 2:
         await update.message.reply_text(get_text(lang, "assign_min_participants"))
         return
@@ -208,7 +196,135 @@ async def assign(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     )
 
 
-async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def new_season(update: Update, context: BotContext) -> None:
+    """Show button to start a new season in the same group (admin only)."""
+    chat = update.effective_chat
+    user = update.effective_user
+    lang = await get_lang(context, chat.id)
+
+    if chat.type == "private":
+        await update.message.reply_text(get_text(lang, "newseason_group_only"))
+        return
+
+    # Check if user is admin
+    if not await is_admin(context, chat.id, user.id):
+        await update.message.reply_text(get_text(lang, "newseason_admin_only"))
+        return
+
+    # Check if group exists
+    group = await context.db.get_group(chat.id)
+    if not group:
+        await update.message.reply_text(get_text(lang, "newseason_setup_first"))
+        return
+
+    if not group[5]:
+        await update.message.reply_text(get_text(lang, "newseason_not_assigned"))
+        return
+
+    # Create confirmation button
+    keyboard = [
+        [
+            InlineKeyboardButton(get_text(lang, "newseason_button_text"), callback_data=f"newseason_{chat.id}"),
+        ]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+
+    await update.message.reply_text(
+        get_text(lang, "newseason_confirmation"),
+        reply_markup=reply_markup,
+        parse_mode=ParseMode.MARKDOWN
+    )
+
+
+def find_participant(participants, mention: str):
+    """The participant row a @username or user id refers to, or None"""
+    name = mention.lstrip("@").lower()
+    for row in participants:
+        user_id, username = row[0], row[1]
+        if (username and username.lower() == name) or str(user_id) == name:
+            return row
+    return None
+
+
+async def exclude(update: Update, context: BotContext) -> None:
+    """Keep two participants from drawing each other, or list exclusions (admin only)."""
+    await update_exclusion(update, context, remove=False)
+
+
+async def unexclude(update: Update, context: BotContext) -> None:
+    """Lift an exclusion between two participants (admin only)."""
+    await update_exclusion(update, context, remove=True)
+
+
+async def update_exclusion(update: Update, context: BotContext, remove: bool) -> None:
+    """Shared body of /exclude and /unexclude."""
+    chat = update.effective_chat
+    user = update.effective_user
+    lang = await get_lang(context, chat.id)
+
+    if chat.type == "private":
+        await update.message.reply_text(get_text(lang, "exclude_group_only"))
+        return
+
+    # Check if user is admin
+    if not await is_admin(context, chat.id, user.id):
+        await update.message.reply_text(get_text(lang, "exclude_admin_only"))
+        return
+
+    # Check if group exists
+    group = await context.db.get_group(chat.id)
+    if not group:
+        await update.message.reply_text(get_text(lang, "exclude_setup_first"))
+        return
+
+    participants = await context.db.get_participants(chat.id)
+
+    if len(context.args) != 2:
+        exclusions = await context.db.get_exclusions(chat.id)
+        if not exclusions or remove:
+            await update.message.reply_text(get_text(lang, "exclude_usage"), parse_mode=ParseMode.MARKDOWN)
+        else:
+            await update.message.reply_text(
+                exclusions_message(lang, exclusions, participants), parse_mode=ParseMode.MARKDOWN
+            )
+        return
+
+    if group[5]:
+        await update.message.reply_text(get_text(lang, "exclude_already_assigned"))
+        return
+
+    pair = []
+    for mention in context.args:
+        row = find_participant(participants, mention)
+        if not row:
+            await update.message.reply_text(get_text(lang, "exclude_not_participant", name=mention))
+            return
+        pair.append(row[0])
+    first, second = pair
+    if first == second:
+        await update.message.reply_text(get_text(lang, "exclude_same_person"))
+        return
+
+    names = participant_names(participants)
+    if remove:
+        changed = await context.db.remove_exclusion(chat.id, first, second)
+        key = "unexclude_success" if changed else "unexclude_not_found"
+    else:
+        changed = await context.db.add_exclusion(chat.id, first, second)
+        key = "exclude_success" if changed else "exclude_error"
+    if changed:
+        logger.info(
+            f"🚫 Exclusion {'removed' if remove else 'added'} | "
+            f"Group: {chat.id} | "
+            f"Pair: {first}, {second} | "
+            f"Admin: {user.id} (@{user.username or 'N/A'})"
+        )
+    await update.message.reply_text(
+        get_text(lang, key, first=names[first], second=names[second]), parse_mode=ParseMode.MARKDOWN
+    )
+
+
+async def button_callback(update: Update, context: BotContext) -> None:
     """Handle button callbacks."""
     query = update.callback_query
     await query.answer()
@@ -216,104 +332,96 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     data = query.data
     if data.startswith("assign_"):
         group_id = int(data.split("_")[1])
-        chat = await context.bot.get_chat(group_id)
         user = query.from_user
-        lang = get_lang(group_id)
+        lang = await get_lang(context, group_id)
 
         # Check if user is admin
-        member = await chat.get_member(user.id)
-        if member.status not in ["creator", "administrator"]:
+        if not await is_admin(context, group_id, user.id):
             await query.edit_message_text(get_text(lang, "assign_admin_only"))
             return
 
-        # Assign Secret Santas
-        if db.assign_secret_santas(group_id):
-            participants = db.get_participants(group_id)
+        group_info = await context.db.get_group(group_id)
+        if not group_info:
+            await query.edit_message_text(get_text(lang, "assign_error"))
+            return
+        _, _, event_date, max_price, _, _ = group_info
+
+        def render(assignments):
+            return [
+                (giver_id, assignment_message(lang, event_date, max_price, assigned_first_name, assigned_username, assigned_wish))
+                for giver_id, _, _, _, assigned_username, assigned_first_name, assigned_wish in assignments
+            ]
+
+        # Assign Secret Santas and queue everyone's DM in the same transaction;
+        # a repeated click gets the existing draw back and queues nothing
+        try:
+            assignments, drawn = await context.db.assign_secret_santas(group_id, render, **context.history_policy)
+        except Infeasible as e:
+            logger.warning(f"No valid draw for group {group_id}: {e}")
+            participants = await context.db.get_participants(group_id)
+            await query.edit_message_text(
+                infeasible_message(lang, e.givers, e.receivers, participants), parse_mode=ParseMode.MARKDOWN
+            )
+            return
+        if assignments and not drawn:
+            await query.edit_message_text(get_text(lang, "assign_already_assigned"))
+        elif assignments:
+            context.outbox.wake()
             logger.info(
                 f"🎁 Secret Santas assigned | "
                 f"Group: {group_id} | "
-                f"Participants: {len(participants)} | "
+                f"Participants: {len(assignments)} | "
                 f"Admin: {user.id} (@{user.username or 'N/A'})"
             )
 
             await query.edit_message_text(get_text(lang, "assign_success"), parse_mode=ParseMode.MARKDOWN)
+        else:
+            logger.error(f"Failed to assign Secret Santas for group {group_id}")
+            await query.edit_message_text(get_text(lang, "assign_error"))
 
-            # Send DMs to all participants
-            group_info = db.get_group(group_id)
-            _, _, event_date, max_price, language, _ = group_info
-
-            dm_sent_count = 0
-            dm_failed_count = 0
-
-            for user_id, username, first_name, _ in participants:
-                assignment = db.get_assignment(group_id, user_id)
-                if assignment:
-                    assigned_user_id, assigned_username, assigned_first_name, assigned_wish = assignment
-                    try:
-                        message = get_text(lang, "assignment_header")
-                        message += get_text(lang, "assignment_for", name=escape_markdown(assigned_first_name))
-                        if assigned_username:
-                            message += f" (@{escape_markdown(assigned_username)})"
-                        message += "\n\n"
-
-                        if event_date:
-                            message += get_text(lang, "assignment_event_date", date=event_date)
-                        if max_price:
-                            message += get_text(lang, "assignment_max_price", price=max_price)
-
-                        # Show wish if available
-                        if assigned_wish:
-                            message += get_text(lang, "wish_display", wish=escape_markdown(assigned_wish))
-                        else:
-                            message += get_text(lang, "wish_not_set")
-
-                        message += get_text(lang, "assignment_keep_secret")
-
-                        await context.bot.send_message(chat_id=user_id, text=message, parse_mode=ParseMode.MARKDOWN)
-                        dm_sent_count += 1
-
-                        logger.info(
-                            f"📬 Assignment DM sent | "
-                            f"Group: {group_id} | "
-                            f"To: {user_id} (@{username or 'N/A'}) | "
-                            f"Assigned: {assigned_first_name} (@{assigned_username or 'N/A'})"
-                        )
-                    except Exception as e:
-                        dm_failed_count += 1
-                        logger.error(
-                            f"❌ Failed to send assignment DM | "
-                            f"Group: {group_id} | "
-                            f"To: {user_id} (@{username or 'N/A'}) | "
-                            f"Error: {e}"
-                        )
+    elif data.startswith("newseason_"):
+        group_id = int(data.split("_")[1])
+        user = query.from_user
+        lang = await get_lang(context, group_id)
+
+        # Check if user is admin
+        if not await is_admin(context, group_id, user.id):
+            await query.edit_message_text(get_text(lang, "newseason_admin_only"))
+            return
 
+        # A repeated click finds the group undrawn and changes nothing
+        season = await context.db.start_new_season(group_id)
+        if season:
             logger.info(
-                f"Assignment DM summary for group {group_id}: "
-                f"{dm_sent_count} sent, {dm_failed_count} failed out of {len(participants)} participants"
+                f"🔄 New season | "
+                f"Group: {group_id} | "
+                f"Season: {season} | "
+                f"Admin: {user.id} (@{user.username or 'N/A'})"
             )
+            await query.edit_message_text(get_text(lang, "newseason_success", season=season), parse_mode=ParseMode.MARKDOWN)
+        elif await context.db.get_group(group_id):
+            await query.edit_message_text(get_text(lang, "newseason_not_assigned"))
         else:
-            logger.error(f"Failed to assign Secret Santas for group {group_id}")
-            await query.edit_message_text(get_text(lang, "assign_error"))
+            await query.edit_message_text(get_text(lang, "newseason_error"))
 
 
-async def lang_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def lang_command(update: Update, context: BotContext) -> None:
     """Change language for the group."""
     chat = update.effective_chat
     user = update.effective_user
-    current_lang = get_lang(chat.id)
+    current_lang = await get_lang(context, chat.id)
 
     if chat.type == "private":
         await update.message.reply_text(get_text(current_lang, "setup_private_only"))
         return
 
     # Check if user is admin
-    member = await chat.get_member(user.id)
-    if member.status not in ["creator", "administrator"]:
+    if not await is_admin(context, chat.id, user.id):
         await update.message.reply_text(get_text(current_lang, "setup_admin_only"))
         return
 
     # Check if group exists
-    group = db.get_group(chat.id)
+    group = await context.db.get_group(chat.id)
     if not group:
         await update.message.reply_text(get_text(current_lang, "setdate_setup_first"))
         return
@@ -329,7 +437,7 @@ async def lang_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         return
 
     # Update language
-    if db.set_language(chat.id, new_lang):
+    if await context.db.set_language(chat.id, new_lang):
         logger.info(
             f"🌐 Language changed | "
             f"Group: {chat.id} | "
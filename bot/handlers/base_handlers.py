@@ -2,29 +2,19 @@
 Base command handlers for Secret Santa Bot
 """
 from telegram import Update
-from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
-from bot.utils import get_lang
+from bot.context import BotContext
+from bot.utils import get_lang, remember_member_status
 from bot.translations import get_text
+from bot.markdown import escape_markdown
 
 
-def escape_markdown(text: str) -> str:
-    """Escape special Markdown characters to prevent parsing errors."""
-    if not text:
-        return text
-    # Escape Markdown special characters
-    special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-    for char in special_chars:
-        text = text.replace(char, '\\' + char)
-    return text
-
-
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def start(update: Update, context: BotContext) -> None:
     """Send a message when the command /start is issued."""
     user = update.effective_user
     chat = update.effective_chat
-    lang = get_lang(chat.id)
+    lang = await get_lang(context, chat.id)
 
     if chat.type == "private":
         await update.message.reply_text(
@@ -38,10 +28,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         )
 
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def help_command(update: Update, context: BotContext) -> None:
     """Send help message with instructions."""
     chat = update.effective_chat
-    lang = get_lang(chat.id)
+    lang = await get_lang(context, chat.id)
 
     if chat.type == "private":
         await update.message.reply_text(
@@ -53,3 +43,17 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
             get_text(lang, "help_group"),
             parse_mode=ParseMode.MARKDOWN
         )
+
+
+async def track_chat_member(update: Update, context: BotContext) -> None:
+    """Keep the admin cache current when a member is promoted, demoted or leaves."""
+    change = update.chat_member
+    new_member = change.new_chat_member
+    remember_member_status(context, change.chat.id, new_member.user.id, new_member.status)
+
+
+async def remember_chat_title(update: Update, context: BotContext) -> None:
+    """Keep groups.title current so /myassignment never has to call get_chat."""
+    chat = update.effective_chat
+    if chat and chat.type in ("group", "supergroup"):
+        await context.db.set_group_title(chat.id, chat.title)
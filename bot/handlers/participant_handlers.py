@@ -2,50 +2,45 @@
 Participant command handlers for Secret Santa Bot
 """
 import logging
-from telegram import Update
-from telegram.ext import ContextTypes
+from typing import List, Optional, Tuple
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ParseMode
 
-from bot.utils import get_lang, db
+from bot.context import BotContext
+from bot.utils import get_lang
 from bot.translations import get_text
+from bot.markdown import escape_markdown
+from bot.messages import assignment_message, info_message, participants_page
 
 logger = logging.getLogger(__name__)
 
+# Roster rows fetched per /participants page; fewer are shown if they don't fit one message
+PARTICIPANTS_PAGE_SIZE = 50
 
-def escape_markdown(text: str) -> str:
-    """Escape special Markdown characters to prevent parsing errors."""
-    if not text:
-        return text
-    # Escape Markdown special characters
-    special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-    for char in special_chars:
-        text = text.replace(char, '\\' + char)
-    return text
 
-
-async def join(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def join(update: Update, context: BotContext) -> None:
     """Join the Secret Santa in this group."""
     chat = update.effective_chat
     user = update.effective_user
-    lang = get_lang(chat.id)
+    lang = await get_lang(context, chat.id)
 
     if chat.type == "private":
         await update.message.reply_text(get_text(lang, "join_group_only"))
         return
 
     # Check if group exists
-    group = db.get_group(chat.id)
+    group = await context.db.get_group(chat.id)
     if not group:
         await update.message.reply_text(get_text(lang, "join_setup_first"))
         return
 
     # Check if already assigned
-    if db.is_group_assigned(chat.id):
+    if await context.db.is_group_assigned(chat.id):
         await update.message.reply_text(get_text(lang, "join_already_assigned"))
         return
 
     # Add participant
-    if db.add_participant(chat.id, user.id, user.username, user.first_name):
+    if await context.db.add_participant(chat.id, user.id, user.username, user.first_name):
         logger.info(
             f"➕ New participant joined | "
             f"Group: {chat.id} ({chat.title}) | "
@@ -61,243 +56,215 @@ async def join(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text(get_text(lang, "join_already_in", name=escape_markdown(user.first_name)))
 
 
-async def participants(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def participants(update: Update, context: BotContext) -> None:
     """Show all participants in the Secret Santa."""
     chat = update.effective_chat
-    lang = get_lang(chat.id)
+    lang = await get_lang(context, chat.id)
 
     if chat.type == "private":
         await update.message.reply_text(get_text(lang, "participants_group_only"))
         return
 
     # Check if group exists
-    group = db.get_group(chat.id)
+    group = await context.db.get_group(chat.id)
     if not group:
         await update.message.reply_text(get_text(lang, "participants_setup_first"))
         return
 
-    # Get participants
-    parts = db.get_participants(chat.id)
-    if not parts:
+    # First page of the roster
+    rows, total = await context.db.get_participants_page(chat.id, limit=PARTICIPANTS_PAGE_SIZE)
+    if not rows:
         await update.message.reply_text(get_text(lang, "participants_none"))
         return
 
-    participant_list = "\n".join(
-        [f"{i+1}. {escape_markdown(p[2] or 'Unknown')} (@{escape_markdown(p[1] or 'no username')})" for i, p in enumerate(parts)]
-    )
-    await update.message.reply_text(
-        get_text(lang, "participants_list", count=len(parts), list=participant_list),
-        parse_mode=ParseMode.MARKDOWN
-    )
+    text, reply_markup = participants_reply(lang, rows, 1, total)
+    await update.message.reply_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+
+
+def participants_reply(lang: str, rows: List[Tuple], start: int, total: int,
+                       from_end: bool = False) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Text and Prev/Next buttons of one /participants page (see participants_page)."""
+    text, rows = participants_page(lang, rows, start, total, from_end)
+    if from_end:
+        start -= len(rows)
+
+    # Buttons carry the keyset cursor (participants.id) and the number of the next row shown
+    buttons = []
+    if start > 1:
+        buttons.append(InlineKeyboardButton(
+            get_text(lang, "participants_prev"), callback_data=f"participants_prev_{rows[0][0]}_{start}"
+        ))
+    if start + len(rows) <= total:
+        buttons.append(InlineKeyboardButton(
+            get_text(lang, "participants_next"), callback_data=f"participants_next_{rows[-1][0]}_{start + len(rows)}"
+        ))
+    return text, InlineKeyboardMarkup([buttons]) if buttons else None
+
+
+async def participants_navigation(update: Update, context: BotContext) -> None:
+    """Handle the /participants Prev/Next buttons by editing the roster message in place."""
+    query = update.callback_query
+    await query.answer()
+
+    chat_id = update.effective_chat.id
+    lang = await get_lang(context, chat_id)
+    _, direction, cursor, start = query.data.split("_")
+    cursor, start = int(cursor), int(start)
+
+    if direction == "prev":
+        rows, total = await context.db.get_participants_page(chat_id, before=cursor, limit=PARTICIPANTS_PAGE_SIZE)
+        from_end = True
+        if len(rows) < PARTICIPANTS_PAGE_SIZE:
+            # Nothing further back: this is the first page
+            start, from_end = 1, False
+    else:
+        rows, total = await context.db.get_participants_page(chat_id, after=cursor, limit=PARTICIPANTS_PAGE_SIZE)
+        from_end = False
+    if not rows:
+        # The roster changed under the buttons; start over
+        rows, total = await context.db.get_participants_page(chat_id, limit=PARTICIPANTS_PAGE_SIZE)
+        start, from_end = 1, False
+    if not rows:
+        await query.edit_message_text(get_text(lang, "participants_none"))
+        return
+
+    text, reply_markup = participants_reply(lang, rows, start, total, from_end)
+    await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
 
 
-async def info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def info(update: Update, context: BotContext) -> None:
     """Show group information."""
     chat = update.effective_chat
-    lang = get_lang(chat.id)
+    lang = await get_lang(context, chat.id)
 
     if chat.type == "private":
         await update.message.reply_text(get_text(lang, "info_group_only"))
         return
 
     # Check if group exists
-    group = db.get_group(chat.id)
+    group = await context.db.get_group(chat.id)
     if not group:
         await update.message.reply_text(get_text(lang, "info_setup_first"))
         return
 
     group_id, admin_id, event_date, max_price, language, is_assigned = group
-    parts = db.get_participants(chat.id)
+    parts = await context.db.get_participants(chat.id)
 
-    info_text = get_text(lang, "info_header")
-    if event_date:
-        info_text += get_text(lang, "info_event_date", date=event_date)
-    else:
-        info_text += get_text(lang, "info_event_date_not_set")
-
-    if max_price:
-        info_text += get_text(lang, "info_max_price", price=max_price)
-    else:
-        info_text += get_text(lang, "info_max_price_not_set")
-
-    info_text += get_text(lang, "info_participants", count=len(parts))
-    info_text += get_text(lang, "info_status_assigned" if is_assigned else "info_status_not_assigned")
+    info_text = info_message(lang, event_date, max_price, len(parts), is_assigned)
 
     await update.message.reply_text(info_text, parse_mode=ParseMode.MARKDOWN)
 
 
-async def my_assignment(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def my_assignment(update: Update, context: BotContext) -> None:
     """Show user's Secret Santa assignment in private chat."""
     user = update.effective_user
     chat = update.effective_chat
 
     if chat.type != "private":
         # In group, use group's language
-        lang = get_lang(chat.id)
+        lang = await get_lang(context, chat.id)
         await update.message.reply_text(get_text(lang, "myassignment_group_only"))
         return
 
-    # Get all groups where user has assignments
-    user_groups = db.get_user_groups(user.id)
+    # Every assigned group with its settings and the user's assignee, in one query
+    dashboard = await context.db.get_user_dashboard(user.id)
 
-    if not user_groups:
+    if not dashboard:
         # Default to Russian for private chat if no groups found
         await update.message.reply_text(get_text("ru", "myassignment_not_ready"))
         return
 
     # Show all assignments
-    for group_id, group_lang in user_groups:
-        group_info = db.get_group(group_id)
-        if not group_info:
-            continue
-
-        _, _, event_date, max_price, language, is_assigned = group_info
-
-        assignment = db.get_assignment(group_id, user.id)
-        if assignment:
-            assigned_user_id, assigned_username, assigned_first_name, assigned_wish = assignment
-
-            # Get group name
-            try:
-                group_chat = await context.bot.get_chat(group_id)
-                group_name = group_chat.title
-            except Exception:
-                group_name = f"Group {group_id}"
-
-            # Build message in the group's language
-            message = f"🎁 {escape_markdown(group_name)}\n\n"
-            message += get_text(group_lang, "assignment_header")
-            message += get_text(group_lang, "assignment_for", name=escape_markdown(assigned_first_name))
-            if assigned_username:
-                message += f" (@{escape_markdown(assigned_username)})"
-            message += "\n\n"
-
-            if event_date:
-                message += get_text(group_lang, "assignment_event_date", date=event_date)
-            if max_price:
-                message += get_text(group_lang, "assignment_max_price", price=max_price)
-
-            # Show wish if available
-            if assigned_wish:
-                message += get_text(group_lang, "wish_display", wish=escape_markdown(assigned_wish))
-            else:
-                message += get_text(group_lang, "wish_not_set")
-
-            message += get_text(group_lang, "assignment_keep_secret")
+    for row in dashboard:
+        (group_id, group_lang, group_title, event_date, max_price,
+         assigned_user_id, assigned_username, assigned_first_name, assigned_wish) = row
+        group_name = group_title or f"Group {group_id}"
+
+        # Build message in the group's language
+        message = assignment_message(
+            group_lang, event_date, max_price,
+            assigned_first_name, assigned_username, assigned_wish,
+            group_name=group_name,
+        )
 
-            await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+        await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
 
 
-async def wish(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def wish(update: Update, context: BotContext) -> None:
     """Set a gift wish for Secret Santa."""
     user = update.effective_user
     chat = update.effective_chat
 
     if chat.type != "private":
         # In group, use group's language
-        lang = get_lang(chat.id)
+        lang = await get_lang(context, chat.id)
         await update.message.reply_text(get_text(lang, "wish_private_only"))
         return
 
-    # Get all groups where user is a participant
-    user_groups = db.get_user_groups(user.id)
-
-    # Also check for groups where user joined but assignments not done yet
-    all_user_groups = []
-    try:
-        with db.get_connection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute("""
-                    SELECT DISTINCT g.group_id, g.language
-                    FROM participants p
-                    JOIN groups g ON p.group_id = g.group_id
-                    WHERE p.user_id = %s
-                """, (user.id,))
-                all_user_groups = cursor.fetchall()
-    except Exception as e:
-        logger.error(f"Error getting user groups for wish: {e}")
-
-    if not all_user_groups:
-        # Default to Russian for private chat if no groups found
-        await update.message.reply_text(get_text("ru", "wish_no_groups"))
-        return
-
     # Check if wish provided
     if not context.args:
+        all_user_groups = await context.db.get_participant_groups(user.id)
+        if not all_user_groups:
+            # Default to Russian for private chat if no groups found
+            await update.message.reply_text(get_text("ru", "wish_no_groups"))
+            return
         # Use language from first group
-        lang = all_user_groups[0][1] if all_user_groups else "ru"
+        lang = all_user_groups[0][1]
         await update.message.reply_text(get_text(lang, "wish_usage"))
         return
 
     wish_text = " ".join(context.args)
 
-    # Set wish for all groups the user is in
-    success_count = 0
-    lang = all_user_groups[0][1] if all_user_groups else "ru"
+    name = escape_markdown(user.first_name or user.username or "Someone")
 
-    for group_id, group_lang in all_user_groups:
-        if db.set_wish(group_id, user.id, wish_text):
-            success_count += 1
-            logger.info(
-                f"🎁 Wish set | "
-                f"Group: {group_id} | "
-                f"User: {user.id} (@{user.username or 'N/A'}) | "
-                f"Wish length: {len(wish_text)} chars"
-            )
+    def render(updated):
+        # Notify Secret Santas in groups where assignments have been made
+        return [
+            (santa_user_id, get_text(group_lang, "wish_notification", name=name, wish=escape_markdown(wish_text)))
+            for group_id, group_lang, santa_user_id, santa_username, santa_first_name in updated
+            if santa_user_id is not None
+        ]
 
-            # Notify Secret Santa if assignments have been made
-            if db.is_group_assigned(group_id):
-                secret_santa = db.get_secret_santa_for_user(group_id, user.id)
-                if secret_santa:
-                    santa_user_id, santa_username, santa_first_name = secret_santa
-                    try:
-                        notification = get_text(
-                            group_lang,
-                            "wish_notification",
-                            name=escape_markdown(user.first_name or user.username or "Someone"),
-                            wish=escape_markdown(wish_text)
-                        )
-                        await context.bot.send_message(
-                            chat_id=santa_user_id,
-                            text=notification,
-                            parse_mode=ParseMode.MARKDOWN
-                        )
-                        logger.info(
-                            f"🔔 Wish notification sent | "
-                            f"Group: {group_id} | "
-                            f"From: {user.id} (@{user.username or 'N/A'}) | "
-                            f"To Santa: {santa_user_id} (@{santa_username or 'N/A'})"
-                        )
-                    except Exception as e:
-                        logger.error(
-                            f"❌ Failed to send wish notification | "
-                            f"Group: {group_id} | "
-                            f"Santa: {santa_user_id} (@{santa_username or 'N/A'}) | "
-                            f"Error: {e}"
-                        )
-
-    if success_count > 0:
-        await update.message.reply_text(
-            get_text(lang, "wish_set_success", wish=escape_markdown(wish_text)),
-            parse_mode=ParseMode.MARKDOWN
-        )
-    else:
-        await update.message.reply_text(get_text(lang, "wish_error"))
+    # Set wish for all groups the user is in and queue the Santas' notifications with it
+    updated = await context.db.set_wish_everywhere(user.id, wish_text, render)
+
+    if updated is None:
+        await update.message.reply_text(get_text("ru", "wish_error"))
+        return
+
+    if not updated:
+        # Default to Russian for private chat if no groups found
+        await update.message.reply_text(get_text("ru", "wish_no_groups"))
+        return
+
+    context.outbox.wake()
+    lang = updated[0][1]
+    logger.info(
+        f"🎁 Wish set | "
+        f"Groups: {len(updated)} | "
+        f"User: {user.id} (@{user.username or 'N/A'}) | "
+        f"Wish length: {len(wish_text)} chars"
+    )
+
+    await update.message.reply_text(
+        get_text(lang, "wish_set_success", wish=escape_markdown(wish_text)),
+        parse_mode=ParseMode.MARKDOWN
+    )
 
 
-async def chat_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def chat_command(update: Update, context: BotContext) -> None:
     """Send anonymous message to Secret Santa."""
     user = update.effective_user
     chat = update.effective_chat
 
     if chat.type != "private":
         # In group, use group's language
-        lang = get_lang(chat.id)
+        lang = await get_lang(context, chat.id)
         await update.message.reply_text(get_text(lang, "chat_group_only"))
         return
 
     # Get all groups where user has assignments
-    user_groups = db.get_user_groups(user.id)
+    user_groups = await context.db.get_user_groups(user.id)
 
     if not user_groups:
         # Default to Russian for private chat if no groups found
@@ -315,83 +282,31 @@ async def chat_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     message_text = " ".join(context.args)
     message_preview = message_text[:50] + "..." if len(message_text) > 50 else message_text
 
-    # If user is in multiple groups, let them select (for now, send to first group)
+    # Queue the message for the user's Secret Santa in every group
     # TODO: Add proper group selection with inline keyboard
-    if len(user_groups) > 1:
-        # For now, send to all groups
-        sent_count = 0
-        logger.info(
-            f"Anonymous message from user {user.id} (@{user.username}) "
-            f"to {len(user_groups)} groups, message length: {len(message_text)}"
-        )
-
-        for group_id, group_lang in user_groups:
-            # Find who is giving to this user (their Secret Santa)
-            secret_santa = db.get_secret_santa_for_user(group_id, user.id)
-            if secret_santa:
-                santa_user_id, santa_username, santa_first_name = secret_santa
-                try:
-                    # Send message to Secret Santa
-                    full_message = get_text(group_lang, "chat_received_header") + escape_markdown(message_text)
-                    await context.bot.send_message(chat_id=santa_user_id, text=full_message, parse_mode=ParseMode.MARKDOWN)
-                    sent_count += 1
-
-                    logger.info(
-                        f"✅ Anonymous message delivered | "
-                        f"Group: {group_id} | "
-                        f"From: {user.id} (@{user.username or 'N/A'}) | "
-                        f"To Santa: {santa_user_id} (@{santa_username or 'N/A'}) | "
-                        f"Preview: '{message_preview}'"
-                    )
-                except Exception as e:
-                    logger.error(
-                        f"❌ Failed to send anonymous message | "
-                        f"Group: {group_id} | "
-                        f"From: {user.id} (@{user.username or 'N/A'}) | "
-                        f"To Santa: {santa_user_id} (@{santa_username or 'N/A'}) | "
-                        f"Error: {e}"
-                    )
-
-        if sent_count > 0:
-            lang = user_groups[0][1]
-            await update.message.reply_text(get_text(lang, "chat_message_sent"))
-            logger.info(f"User {user.id} successfully sent anonymous messages to {sent_count}/{len(user_groups)} groups")
-        else:
-            await update.message.reply_text(get_text("ru", "chat_error"))
-            logger.warning(f"User {user.id} failed to send anonymous messages to any groups")
-    else:
-        # Single group - send to that group's Secret Santa
-        group_id, group_lang = user_groups[0]
-
+    messages = []
+    for group_id, group_lang in user_groups:
         # Find who is giving to this user (their Secret Santa)
-        secret_santa = db.get_secret_santa_for_user(group_id, user.id)
+        secret_santa = await context.db.get_secret_santa_for_user(group_id, user.id)
         if secret_santa:
             santa_user_id, santa_username, santa_first_name = secret_santa
-            try:
-                # Send message to Secret Santa
-                full_message = get_text(group_lang, "chat_received_header") + escape_markdown(message_text)
-                await context.bot.send_message(chat_id=santa_user_id, text=full_message, parse_mode=ParseMode.MARKDOWN)
-                await update.message.reply_text(get_text(group_lang, "chat_message_sent"))
-
-                logger.info(
-                    f"✅ Anonymous message delivered | "
-                    f"Group: {group_id} | "
-                    f"From: {user.id} (@{user.username or 'N/A'}, {user.first_name}) | "
-                    f"To Santa: {santa_user_id} (@{santa_username or 'N/A'}, {santa_first_name}) | "
-                    f"Length: {len(message_text)} chars | "
-                    f"Preview: '{message_preview}'"
-                )
-            except Exception as e:
-                logger.error(
-                    f"❌ Failed to send anonymous message | "
-                    f"Group: {group_id} | "
-                    f"From: {user.id} (@{user.username or 'N/A'}) | "
-                    f"To Santa: {santa_user_id} (@{santa_username or 'N/A'}) | "
-                    f"Error: {e}"
-                )
-                await update.message.reply_text(get_text(group_lang, "chat_error"))
-        else:
-            logger.warning(
-                f"No Secret Santa found for user {user.id} (@{user.username}) in group {group_id}"
+            full_message = get_text(group_lang, "chat_received_header") + escape_markdown(message_text)
+            messages.append((santa_user_id, full_message))
+            logger.info(
+                f"✅ Anonymous message queued | "
+                f"Group: {group_id} | "
+                f"From: {user.id} (@{user.username or 'N/A'}) | "
+                f"To Santa: {santa_user_id} (@{santa_username or 'N/A'}) | "
+                f"Preview: '{message_preview}'"
             )
-            await update.message.reply_text(get_text(group_lang, "chat_error"))
+        else:
+            logger.warning(f"No Secret Santa found for user {user.id} (@{user.username}) in group {group_id}")
+
+    lang = user_groups[0][1]
+    if messages and await context.db.enqueue_messages(messages):
+        context.outbox.wake()
+        await update.message.reply_text(get_text(lang, "chat_message_sent"))
+        logger.info(f"User {user.id} queued anonymous messages to {len(messages)}/{len(user_groups)} groups")
+    else:
+        await update.message.reply_text(get_text(lang, "chat_error"))
+        logger.warning(f"User {user.id} failed to send anonymous messages to any groups")
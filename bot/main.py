@@ -2,23 +2,55 @@
 Secret Santa Telegram Bot
 Main application entry point
 """
+import asyncio
 import logging
+import time
+from typing import List, Optional
 from telegram import Update
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ChatMemberHandler, TypeHandler, ContextTypes
 
-from bot.config import get_bot_token
-from bot.handlers.base_handlers import start, help_command
+from bot.cache import TTLCache
+from bot.config import (
+    get_bot_token,
+    get_bot_mode,
+    get_webhook_config,
+    get_metrics_config,
+    get_tracing_config,
+    get_update_concurrency,
+    get_worker_count,
+    get_reminder_days,
+    get_history_policy,
+    get_storage_backend,
+    get_message_rate,
+    get_cache_ttl,
+)
+from bot.context import BotContext
+from bot.metrics import MetricsServer, InstrumentedRequest, instrument_application, instrument_storage, instrument_cache
+from bot.notifications import set_rate_limit
+from bot.outbox import OutboxWorker
+from bot.processing import ChatOrderedUpdateProcessor
+from bot.reminders import ReminderScheduler
+from bot.sharding import build_front_application
+from bot.storage import create_storage
+from bot.tracing import TracingApplication, configure as configure_tracing
+from bot.utils import ADMIN_CACHE_SIZE, ADMIN_CACHE_TTL
+from bot.webhook import run_webhook
+from bot.handlers.base_handlers import start, help_command, track_chat_member, remember_chat_title
 from bot.handlers.admin_handlers import (
     setup,
     set_date,
     set_price,
     assign,
+    exclude,
+    unexclude,
+    new_season,
     button_callback,
     lang_command,
 )
 from bot.handlers.participant_handlers import (
     join,
     participants,
+    participants_navigation,
     info,
     my_assignment,
     chat_command,
@@ -36,6 +68,9 @@ logger = logging.getLogger(__name__)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("httpcore").setLevel(logging.WARNING)
 
+# Only subscribe to the update types we have handlers for
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY, Update.CHAT_MEMBER]
+
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Log errors caused by updates."""
@@ -52,16 +87,81 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
             logger.error("Could not send error message to user")
 
 
-def main():
-    """Start the bot."""
-    try:
-        token = get_bot_token()
-    except ValueError as e:
-        logger.error(str(e))
-        return
+def log_phase(phase: str, started: float) -> float:
+    """Log how long a startup phase took and return the current time"""
+    now = time.perf_counter()
+    logger.info(f"Startup: {phase} took {(now - started) * 1000:.1f} ms")
+    return now
+
+
+async def post_init(application: Application) -> None:
+    """Create and open the storage and caches and start the background tasks once the event loop is running."""
+    started = phase = time.perf_counter()
+    db = create_storage()
+    phase = log_phase("storage created", phase)
+    await db.open()
+    phase = log_phase("storage opened", phase)
+    application.bot_data["db"] = instrument_storage(db)
+    cache_ttl = get_cache_ttl()
+    admin_ttl = ADMIN_CACHE_TTL if cache_ttl is None else min(ADMIN_CACHE_TTL, cache_ttl)
+    application.bot_data["admin_cache"] = TTLCache(ADMIN_CACHE_SIZE, admin_ttl)
+    instrument_cache("admin", application.bot_data["admin_cache"])
+    phase = log_phase("caches created", phase)
+    outbox = application.bot_data["outbox"] = OutboxWorker(application.bot_data["db"], application.bot)
+    outbox.start()
+    phase = log_phase("outbox worker started", phase)
+    reminder_days = application.bot_data.get("reminder_days")
+    if reminder_days:
+        reminders = application.bot_data["reminders"] = ReminderScheduler(application.bot_data["db"], outbox, reminder_days)
+        reminders.start()
+        phase = log_phase("reminder scheduler started", phase)
+    metrics_server = application.bot_data.get("metrics_server")
+    if metrics_server:
+        await metrics_server.start()
+        log_phase("metrics endpoint started", phase)
+    log_phase("post_init", started)
+
+
+async def post_shutdown(application: Application) -> None:
+    """Stop the metrics endpoint and the background tasks, then close the storage on shutdown."""
+    metrics_server = application.bot_data.get("metrics_server")
+    if metrics_server:
+        await metrics_server.stop()
+    reminders = application.bot_data.pop("reminders", None)
+    if reminders:
+        await reminders.stop()
+    outbox = application.bot_data.pop("outbox", None)
+    if outbox:
+        await outbox.stop()
+    db = application.bot_data.pop("db", None)
+    if db:
+        await db.close()
 
-    # Create the Application
-    application = Application.builder().token(token).build()
+
+def build_application(token: str, concurrency: int, metrics: Optional[dict],
+                      reminder_days: Optional[List[int]] = None,
+                      history_policy: Optional[dict] = None) -> Application:
+    """Build the Application with every handler registered; storage and caches come in post_init"""
+    phase = time.perf_counter()
+    application = (
+        Application.builder()
+        .application_class(TracingApplication)
+        .token(token)
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .context_types(ContextTypes(context=BotContext))
+        .concurrent_updates(ChatOrderedUpdateProcessor(concurrency))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    if metrics:
+        application.bot_data["metrics_server"] = MetricsServer(metrics["listen"], metrics["port"])
+    application.bot_data["reminder_days"] = reminder_days
+    application.bot_data["history_policy"] = history_policy or {}
+    phase = log_phase("application built", phase)
+
+    # Runs before the command handlers for every update
+    application.add_handler(TypeHandler(Update, remember_chat_title), group=-1)
 
     # Register command handlers
     application.add_handler(CommandHandler("start", start))
@@ -72,19 +172,64 @@ def main():
     application.add_handler(CommandHandler("join", join))
     application.add_handler(CommandHandler("participants", participants))
     application.add_handler(CommandHandler("info", info))
+    application.add_handler(CommandHandler("exclude", exclude))
+    application.add_handler(CommandHandler("unexclude", unexclude))
     application.add_handler(CommandHandler("assign", assign))
+    application.add_handler(CommandHandler("newseason", new_season))
     application.add_handler(CommandHandler("myassignment", my_assignment))
     application.add_handler(CommandHandler("lang", lang_command))
     application.add_handler(CommandHandler("wish", wish))
     application.add_handler(CommandHandler("chat", chat_command))
+    application.add_handler(CallbackQueryHandler(participants_navigation, pattern=r"^participants_"))
     application.add_handler(CallbackQueryHandler(button_callback))
+    application.add_handler(ChatMemberHandler(track_chat_member, ChatMemberHandler.CHAT_MEMBER))
 
     # Register error handler
     application.add_error_handler(error_handler)
 
+    # Record latency and errors of every handler
+    instrument_application(application)
+    log_phase("handlers registered", phase)
+    return application
+
+
+def main():
+    """Start the bot."""
+    phase = time.perf_counter()
+    try:
+        token = get_bot_token()
+        mode = get_bot_mode()
+        webhook = get_webhook_config() if mode == "webhook" else None
+        metrics = get_metrics_config()
+        concurrency = get_update_concurrency()
+        workers = get_worker_count()
+        if workers > 1 and get_storage_backend() != "postgres":
+            # Workers don't share an in-memory store, and SQLite's outbox and
+            # reminder claims are only atomic within one process
+            raise ValueError("WORKERS > 1 requires STORAGE_BACKEND=postgres")
+        reminder_days = get_reminder_days()
+        history_policy = get_history_policy()
+        message_rate = get_message_rate()
+        configure_tracing(**get_tracing_config())
+    except ValueError as e:
+        logger.error(str(e))
+        return
+    log_phase("config loaded", phase)
+
+    if workers > 1:
+        # This process only receives updates and hands them to the workers
+        application = build_front_application(token, workers)
+    else:
+        set_rate_limit(message_rate)
+        application = build_application(token, concurrency, metrics, reminder_days, history_policy)
+
     # Run the bot
-    logger.info("Starting Secret Santa bot...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if webhook:
+        logger.info("Starting Secret Santa bot (webhook)...")
+        asyncio.run(run_webhook(application, webhook, ALLOWED_UPDATES))
+    else:
+        logger.info("Starting Secret Santa bot (polling)...")
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 
 if __name__ == "__main__":
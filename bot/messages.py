@@ -0,0 +1,139 @@
+"""
+Composite message builders for Secret Santa Bot
+
+Each builder collects the translated fragments of a multi-part message and
+joins them once, instead of growing a string with repeated +=.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bot.translations import get_text
+from bot.markdown import escape_markdown
+
+
+def assignment_message(lang: str, event_date, max_price, assigned_first_name: str,
+                       assigned_username: Optional[str], assigned_wish: Optional[str],
+                       group_name: Optional[str] = None) -> str:
+    """Build the message telling a participant who they are Secret Santa for."""
+    parts = []
+    if group_name:
+        parts.append(f"🎁 {escape_markdown(group_name)}\n\n")
+    parts.append(get_text(lang, "assignment_header"))
+    parts.append(get_text(lang, "assignment_for", name=escape_markdown(assigned_first_name)))
+    if assigned_username:
+        parts.append(f" (@{escape_markdown(assigned_username)})")
+    parts.append("\n\n")
+
+    if event_date:
+        parts.append(get_text(lang, "assignment_event_date", date=event_date))
+    if max_price:
+        parts.append(get_text(lang, "assignment_max_price", price=max_price))
+
+    # Show wish if available
+    if assigned_wish:
+        parts.append(get_text(lang, "wish_display", wish=escape_markdown(assigned_wish)))
+    else:
+        parts.append(get_text(lang, "wish_not_set"))
+
+    parts.append(get_text(lang, "assignment_keep_secret"))
+    return "".join(parts)
+
+
+def info_message(lang: str, event_date, max_price, participant_count: int, is_assigned: bool) -> str:
+    """Build the /info summary of a group's settings."""
+    return "".join((
+        get_text(lang, "info_header"),
+        get_text(lang, "info_event_date", date=event_date) if event_date
+        else get_text(lang, "info_event_date_not_set"),
+        get_text(lang, "info_max_price", price=max_price) if max_price
+        else get_text(lang, "info_max_price_not_set"),
+        get_text(lang, "info_participants", count=participant_count),
+        get_text(lang, "info_status_assigned" if is_assigned else "info_status_not_assigned"),
+    ))
+
+
+# Telegram's limit on a message's text, in UTF-16 code units
+MAX_MESSAGE_LENGTH = 4096
+
+
+def utf16_length(text: str) -> int:
+    """Length of text as Telegram counts it"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def participants_page(lang: str, rows: List[Tuple], start: int, total: int,
+                      from_end: bool = False) -> Tuple[str, List[Tuple]]:
+    """
+    Build one /participants page from (id, user_id, username, first_name)
+    rows numbered from start. Rows that would push the message over
+    MAX_MESSAGE_LENGTH are left for another page, taken off the end of rows,
+    or off the front when from_end (paging backwards, start is then the
+    number after the last row). Returns the text and the rows it shows.
+    """
+    entries = [
+        f"{escape_markdown(first_name or 'Unknown')} (@{escape_markdown(username or 'no username')})"
+        for _, _, username, first_name in rows
+    ]
+    # Room for the header, the range footer and every line's "N. " prefix
+    budget = (
+        MAX_MESSAGE_LENGTH
+        - utf16_length(get_text(lang, "participants_list", count=total, list=""))
+        - utf16_length(get_text(lang, "participants_range", first=total, last=total, total=total))
+    )
+    prefix = len(f"{total}. \n")
+    order = range(len(entries) - 1, -1, -1) if from_end else range(len(entries))
+    kept = 0
+    for k in order:
+        budget -= prefix + utf16_length(entries[k])
+        if budget < 0 and kept:
+            break
+        kept += 1
+    if from_end:
+        rows, entries = rows[len(rows) - kept:], entries[len(entries) - kept:]
+        start -= kept
+    else:
+        rows, entries = rows[:kept], entries[:kept]
+
+    lines = [f"{i}. {entry}" for i, entry in enumerate(entries, start)]
+    text = get_text(lang, "participants_list", count=total, list="\n".join(lines))
+    if kept < total:
+        text += get_text(lang, "participants_range", first=start, last=start + kept - 1, total=total)
+    return text, rows
+
+
+# Names listed before "and N more" in an infeasible draw
+MAX_LISTED_NAMES = 10
+
+
+def participant_names(participants: Iterable[Tuple]) -> Dict[int, str]:
+    """Escaped display name per user id from (user_id, username, first_name, ...) rows."""
+    return {
+        user_id: escape_markdown(first_name or username or str(user_id))
+        for user_id, username, first_name, *_ in participants
+    }
+
+
+def _list_names(names: Dict[int, str], user_ids: List[int]) -> str:
+    listed = [names.get(user_id, str(user_id)) for user_id in user_ids[:MAX_LISTED_NAMES]]
+    if len(user_ids) > MAX_LISTED_NAMES:
+        listed.append(f"+{len(user_ids) - MAX_LISTED_NAMES}")
+    return ", ".join(listed)
+
+
+def exclusions_message(lang: str, exclusions: Iterable[Tuple], participants: Iterable[Tuple]) -> str:
+    """Build the /exclude listing: one "a ↔ b" line per excluded pair."""
+    names = participant_names(participants)
+    pairs = sorted({tuple(sorted(pair)) for pair in exclusions})
+    lines = [f"{names.get(a, str(a))} ↔ {names.get(b, str(b))}" for a, b in pairs]
+    return get_text(lang, "exclusions_list", count=len(lines), list="\n".join(lines))
+
+
+def infeasible_message(lang: str, givers: List[int], receivers: List[int], participants: Iterable[Tuple]) -> str:
+    """Explain why no draw exists: these givers share too few allowed receivers."""
+    names = participant_names(participants)
+    return get_text(
+        lang, "assign_infeasible",
+        givers=_list_names(names, givers),
+        receivers=_list_names(names, receivers) if receivers else get_text(lang, "assign_infeasible_nobody"),
+        available=len(receivers),
+        needed=len(givers),
+    )
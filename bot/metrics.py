@@ -0,0 +1,303 @@
+"""
+Metrics for Secret Santa Bot
+
+A small in-process registry of counters, gauges and fixed-bucket histograms,
+served in the Prometheus text format on a local HTTP endpoint (METRICS_PORT).
+It records:
+
+* latency and errors of every update handler
+* call count and duration of every storage method
+* connection pool statistics, read at scrape time
+* hits, misses and evictions of the in-process caches, read at scrape time
+* outbound Telegram Bot API calls and failures, per API method
+"""
+import asyncio
+import bisect
+import functools
+import logging
+import time
+from collections import defaultdict
+from http import HTTPStatus
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from telegram.ext import Application
+from telegram.request import HTTPXRequest
+
+from bot.cache import TTLCache
+from bot.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+# Seconds; handler and query latencies of a chat bot live in this range
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base class: a named family of series keyed by label values"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    """Monotonically increasing value"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple, float] = defaultdict(float)
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        self.values[labels] += amount
+
+    def set_total(self, value: float, *labels) -> None:
+        """Publish a total that is counted elsewhere"""
+        self.values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, plus their sum and count"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self.series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {total:g}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class Registry:
+    """All metrics of the process, plus collectors that refresh gauges before a scrape"""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {e}")
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+handler_seconds = registry.register(Histogram(
+    "secretsanta_handler_duration_seconds", "Time spent handling an update, per handler", ("handler",)
+))
+handler_errors = registry.register(Counter(
+    "secretsanta_handler_errors_total", "Updates whose handler raised, per handler", ("handler",)
+))
+storage_seconds = registry.register(Histogram(
+    "secretsanta_storage_call_duration_seconds", "Duration of storage calls, per storage method", ("method",)
+))
+telegram_requests = registry.register(Counter(
+    "secretsanta_telegram_requests_total", "Outbound Telegram Bot API calls, per API method", ("method",)
+))
+telegram_failures = registry.register(Counter(
+    "secretsanta_telegram_request_failures_total",
+    "Telegram Bot API calls that failed or returned an error status, per API method", ("method",)
+))
+pool_stats = registry.register(Gauge(
+    "secretsanta_pool", "Connection pool statistics (psycopg_pool get_stats)", ("stat",)
+))
+cache_hits = registry.register(Counter(
+    "secretsanta_cache_hits_total", "Lookups answered from an in-process cache, per cache", ("cache",)
+))
+cache_misses = registry.register(Counter(
+    "secretsanta_cache_misses_total", "Lookups that were absent or expired in an in-process cache, per cache", ("cache",)
+))
+cache_evictions = registry.register(Counter(
+    "secretsanta_cache_evictions_total", "Entries dropped to stay within a cache's size, per cache", ("cache",)
+))
+cache_entries = registry.register(Gauge(
+    "secretsanta_cache_entries", "Entries currently held by an in-process cache, per cache", ("cache",)
+))
+
+
+def instrument_handler(name: str, callback):
+    """Wrap a handler callback so its latency and errors are recorded under name"""
+    @functools.wraps(callback)
+    async def timed(update, context):
+        start = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            handler_errors.inc(name)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - start, name)
+
+    return timed
+
+
+def instrument_application(application: Application) -> None:
+    """Instrument every registered handler, named after its callback"""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = instrument_handler(handler.callback.__name__, handler.callback)
+
+
+def instrument_storage(storage: Storage) -> Storage:
+    """Time every Storage interface method of an opened backend, in place"""
+    for name in sorted(Storage.__abstractmethods__):
+        method = getattr(storage, name)
+
+        @functools.wraps(method)
+        async def timed(*args, _method=method, _name=name, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await _method(*args, **kwargs)
+            finally:
+                storage_seconds.observe(time.perf_counter() - start, _name)
+
+        setattr(storage, name, timed)
+
+    registry.add_collector(lambda: _collect_pool_stats(storage))
+    for name, cache in storage.caches().items():
+        instrument_cache(name, cache)
+    return storage
+
+
+def instrument_cache(name: str, cache: TTLCache) -> None:
+    """Publish a cache's counters under name at every scrape"""
+    def collect() -> None:
+        stats = cache.stats()
+        cache_hits.set_total(stats["hits"], name)
+        cache_misses.set_total(stats["misses"], name)
+        cache_evictions.set_total(stats["evictions"], name)
+        cache_entries.set(stats["size"], name)
+
+    registry.add_collector(collect)
+
+
+def _collect_pool_stats(storage: Storage) -> None:
+    stats = storage.pool_stats()
+    if "pool_size" in stats and "pool_available" in stats:
+        stats["connections_in_use"] = stats["pool_size"] - stats["pool_available"]
+    for stat, value in stats.items():
+        pool_stats.set(value, stat)
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that counts Bot API calls and failures per API method"""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs) -> Tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        telegram_requests.inc(api_method)
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            telegram_failures.inc(api_method)
+            raise
+        if code >= HTTPStatus.BAD_REQUEST:
+            telegram_failures.inc(api_method)
+        return code, payload
+
+
+class MetricsServer:
+    """Serves GET /metrics; one request per connection, as Prometheus scrapes are infrequent"""
+
+    def __init__(self, listen: str, port: int):
+        self.listen = listen
+        self.port = port
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._handle_connection, self.listen, self.port)
+        logger.info(f"Metrics endpoint listening on {self.listen}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+            method, _, rest = head.decode("latin-1").partition(" ")
+            path = rest.partition(" ")[0].split("?", 1)[0]
+            if method == "GET" and path == "/metrics":
+                status, body = HTTPStatus.OK, registry.render().encode()
+            else:
+                status, body = HTTPStatus.NOT_FOUND, b""
+            writer.write(
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
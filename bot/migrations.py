@@ -0,0 +1,170 @@
+"""
+Versioned schema migrations for Secret Santa Bot
+
+Each migration is applied once, in order, inside its own transaction, and
+recorded in the schema_version table. Startup reads the current version with
+a single query and skips all DDL when the schema is up to date.
+
+To change the schema, append a new (version, description, statements) entry
+to MIGRATIONS. Never edit a migration that has already been released.
+"""
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Serializes migrations when several bot instances start at once
+MIGRATION_LOCK_ID = 0x5A17A
+
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "initial schema", [
+        """
+        CREATE TABLE IF NOT EXISTS groups (
+            group_id BIGINT PRIMARY KEY,
+            admin_id BIGINT NOT NULL,
+            event_date TEXT,
+            max_price REAL,
+            language TEXT DEFAULT 'ru',
+            is_assigned BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS participants (
+            id SERIAL PRIMARY KEY,
+            group_id BIGINT NOT NULL,
+            user_id BIGINT NOT NULL,
+            username TEXT,
+            first_name TEXT,
+            assigned_to BIGINT,
+            FOREIGN KEY (group_id) REFERENCES groups(group_id) ON DELETE CASCADE,
+            UNIQUE(group_id, user_id)
+        )
+        """,
+    ]),
+    (2, "participant wishes", [
+        "ALTER TABLE participants ADD COLUMN IF NOT EXISTS wish TEXT",
+    ]),
+    (3, "cached group titles", [
+        "ALTER TABLE groups ADD COLUMN IF NOT EXISTS title TEXT",
+    ]),
+    (4, "hot-path indexes", [
+        # get_user_groups, get_user_dashboard, /wish
+        "CREATE INDEX IF NOT EXISTS idx_participants_user_id ON participants (user_id)",
+        # get_secret_santa_for_user, /wish Santa lookup
+        "CREATE INDEX IF NOT EXISTS idx_participants_group_assigned_to ON participants (group_id, assigned_to)",
+    ]),
+    (5, "outbox for direct messages", [
+        """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id BIGSERIAL PRIMARY KEY,
+            chat_id BIGINT NOT NULL,
+            text TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            last_error TEXT,
+            failed_at TIMESTAMPTZ,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """,
+        # claim_outbox: due messages that have not been given up on
+        "CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (next_attempt_at) WHERE failed_at IS NULL",
+    ]),
+    (6, "event_date as DATE, reminders", [
+        # /setdate only ever stored YYYY-MM-DD; anything else becomes NULL
+        r"""
+        ALTER TABLE groups ALTER COLUMN event_date TYPE DATE
+        USING CASE WHEN event_date ~ '^\d{4}-\d{2}-\d{2}$' THEN event_date::date END
+        """,
+        "ALTER TABLE groups ADD COLUMN IF NOT EXISTS reminded_on DATE",
+        # claim_due_reminders: groups whose event is in the next few days
+        "CREATE INDEX IF NOT EXISTS idx_groups_event_date ON groups (event_date) WHERE event_date IS NOT NULL",
+    ]),
+    (7, "draw exclusions", [
+        """
+        CREATE TABLE IF NOT EXISTS exclusions (
+            group_id BIGINT NOT NULL REFERENCES groups(group_id) ON DELETE CASCADE,
+            giver_id BIGINT NOT NULL,
+            receiver_id BIGINT NOT NULL,
+            PRIMARY KEY (group_id, giver_id, receiver_id)
+        )
+        """,
+    ]),
+    (8, "seasons and assignment history", [
+        "ALTER TABLE groups ADD COLUMN IF NOT EXISTS season INTEGER NOT NULL DEFAULT 1",
+        # Append-only: one row per giver and season, written by the draw
+        """
+        CREATE TABLE IF NOT EXISTS assignment_history (
+            group_id BIGINT NOT NULL REFERENCES groups(group_id) ON DELETE CASCADE,
+            giver_id BIGINT NOT NULL,
+            season INTEGER NOT NULL,
+            receiver_id BIGINT NOT NULL,
+            drawn_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (group_id, giver_id, season)
+        )
+        """,
+        # Draws of groups assigned before this migration
+        """
+        INSERT INTO assignment_history (group_id, giver_id, season, receiver_id)
+        SELECT p.group_id, p.user_id, 1, p.assigned_to
+        FROM participants p
+        WHERE p.assigned_to IS NOT NULL
+        ON CONFLICT DO NOTHING
+        """,
+    ]),
+    (9, "roster keyset index", [
+        # get_participants_page: WHERE group_id = ? AND id > ? ORDER BY id LIMIT ?
+        "CREATE INDEX IF NOT EXISTS idx_participants_group_id_id ON participants (group_id, id)",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+_CREATE_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# NULL when the version table does not exist yet
+_CURRENT_VERSION = """
+    SELECT CASE WHEN to_regclass('schema_version') IS NULL THEN NULL
+                ELSE (SELECT COALESCE(MAX(version), 0) FROM schema_version)
+           END
+"""
+
+_IS_APPLIED = "SELECT 1 FROM schema_version WHERE version = %s"
+
+
+async def migrate_async(conn) -> int:
+    """Bring the schema up to date on a psycopg AsyncConnection; return the number of migrations applied"""
+    async with conn.cursor() as cursor:
+        await cursor.execute(_CURRENT_VERSION)
+        current = (await cursor.fetchone())[0]
+    await conn.commit()
+    if current == LATEST_VERSION:
+        return 0
+
+    applied = 0
+    for version, description, statements in MIGRATIONS:
+        if current is not None and version <= current:
+            continue
+        async with conn.transaction():
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+                await cursor.execute(_CREATE_VERSION_TABLE)
+                # Another instance may have applied it while we waited for the lock
+                await cursor.execute(_IS_APPLIED, (version,))
+                if await cursor.fetchone():
+                    continue
+                logger.info(f"Applying migration {version}: {description}")
+                for statement in statements:
+                    await cursor.execute(statement)
+                await cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+        applied += 1
+    return applied
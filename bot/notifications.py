@@ -0,0 +1,88 @@
+"""
+Rate-limited message sending for Secret Santa Bot
+
+bot.outbox delivers every queued direct message through send_message.
+"""
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Optional
+
+from telegram import Bot
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows about 30 messages per second to different users;
+# stay a little below that so other handlers still have headroom.
+# This is the default; MESSAGES_PER_SECOND in the environment overrides it.
+MESSAGES_PER_SECOND = 25
+# Sends in flight at once
+MAX_CONCURRENT_SENDS = 20
+# How many times a message is retried after a flood-control response
+MAX_FLOOD_RETRIES = 3
+
+
+class RateLimiter:
+    """Token bucket shared by every send in the process"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it"""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    async def pause(self, seconds: float) -> None:
+        """Drain the bucket after a flood-control response so every sender backs off"""
+        async with self.lock:
+            self.tokens = 0
+            self.updated = time.monotonic() + seconds
+
+
+# Shared by every send in the process so concurrent deliveries don't add up past the limit
+rate_limiter = RateLimiter(MESSAGES_PER_SECOND)
+
+
+def set_rate_limit(rate: float, processes: int = 1) -> None:
+    """Give this process its share of an instance's send rate when several processes send"""
+    global rate_limiter
+    rate_limiter = RateLimiter(rate / processes)
+
+
+def _retry_seconds(error: RetryAfter) -> float:
+    """RetryAfter.retry_after is an int or a timedelta depending on PTB settings"""
+    delay = error.retry_after
+    if isinstance(delay, timedelta):
+        return delay.total_seconds()
+    return float(delay)
+
+
+async def send_message(bot: Bot, chat_id: int, text: str, **kwargs) -> None:
+    """Send one message through the shared rate limiter, retrying on flood control"""
+    for attempt in range(MAX_FLOOD_RETRIES + 1):
+        await rate_limiter.acquire()
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+            return
+        except RetryAfter as e:
+            if attempt == MAX_FLOOD_RETRIES:
+                raise
+            delay = _retry_seconds(e)
+            logger.warning(f"Flood control hit sending to {chat_id}, retrying in {delay:.0f}s")
+            await rate_limiter.pause(delay)
+            await asyncio.sleep(delay)
+
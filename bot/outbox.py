@@ -0,0 +1,121 @@
+"""
+Outbox delivery for Secret Santa Bot
+
+Handlers never send direct messages themselves: they queue them in the
+storage's outbox, in the same transaction as the change that caused them,
+and wake the OutboxWorker. The worker claims due messages in batches, sends
+them through the shared rate limiter and deletes the delivered ones.
+
+A claim is a lease: a claimed message is not due again until LEASE_SECONDS
+have passed, so messages held by a process that died are picked up again,
+and on PostgreSQL any number of processes can deliver from the same table.
+Delivery is at-least-once: a process that dies between a successful send and
+deleting the row leaves the message to be sent again after its lease.
+Failed sends are retried with exponential backoff; a message is given up
+(kept, with failed_at set) after MAX_ATTEMPTS or when Telegram says the
+chat can never be reached.
+"""
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from telegram import Bot
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, Forbidden
+
+from bot.notifications import send_message, MAX_CONCURRENT_SENDS
+from bot.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+# Longer than a batch can take to send, flood-control waits included
+LEASE_SECONDS = 300
+# How often an idle worker looks for due messages it was not woken for
+# (retries, or messages queued by another process)
+POLL_INTERVAL = 5.0
+MAX_ATTEMPTS = 8
+# Retry delays: 10s, 20s, 40s ... capped at an hour
+BACKOFF_BASE = 10.0
+BACKOFF_MAX = 3600.0
+# How long stop() lets the current batch finish
+STOP_TIMEOUT = 10.0
+
+
+def retry_delay(attempts: int, error: Exception) -> Optional[float]:
+    """Seconds until the next attempt after `attempts` failed ones, or None to give up"""
+    # The user blocked the bot or never started it, or the chat/text is invalid
+    if isinstance(error, (Forbidden, BadRequest)) or attempts >= MAX_ATTEMPTS:
+        return None
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+
+
+class OutboxWorker:
+    """Background task that delivers the outbox of one storage backend"""
+
+    def __init__(self, storage: Storage, bot: Bot, concurrency: int = MAX_CONCURRENT_SENDS):
+        self.storage = storage
+        self.bot = bot
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.pending = asyncio.Event()
+        self.stopping = False
+        self.task: Optional[asyncio.Task] = None
+
+    def wake(self) -> None:
+        """Tell the worker new messages were queued"""
+        self.pending.set()
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self.run(), name="outbox")
+
+    async def stop(self) -> None:
+        """Finish the batch being sent, then exit; unsent messages stay queued"""
+        if not self.task:
+            return
+        self.stopping = True
+        self.wake()
+        try:
+            await asyncio.wait_for(self.task, STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Outbox worker did not finish its batch in time")
+        self.task = None
+
+    async def run(self) -> None:
+        logger.info("Outbox worker started")
+        while not self.stopping:
+            self.pending.clear()
+            try:
+                batch = await self.storage.claim_outbox(BATCH_SIZE, LEASE_SECONDS)
+                if batch:
+                    await self.deliver(batch)
+            except Exception as e:
+                logger.error(f"Outbox delivery failed: {e}")
+                batch = []
+            if len(batch) < BATCH_SIZE and not self.stopping:
+                try:
+                    await asyncio.wait_for(self.pending.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info("Outbox worker stopped")
+
+    async def deliver(self, batch: List[Tuple]) -> None:
+        """Send a claimed batch; delivered messages are deleted together at the end"""
+        delivered: List[int] = []
+
+        async def send(message_id: int, chat_id: int, text: str, attempts: int) -> None:
+            async with self.semaphore:
+                try:
+                    await send_message(self.bot, chat_id, text, parse_mode=ParseMode.MARKDOWN)
+                    delivered.append(message_id)
+                except Exception as e:
+                    retry_in = retry_delay(attempts + 1, e)
+                    if retry_in is None:
+                        logger.error(f"❌ Giving up on DM {message_id} | To: {chat_id} | Attempts: {attempts + 1} | Error: {e}")
+                    else:
+                        logger.warning(f"DM {message_id} to {chat_id} failed, retrying in {retry_in:.0f}s: {e}")
+                    await self.storage.release_outbox(message_id, str(e), retry_in)
+
+        await asyncio.gather(*(send(*message) for message in batch))
+        if delivered:
+            await self.storage.complete_outbox(delivered)
+        logger.info(f"📬 Outbox batch | {len(delivered)} delivered, {len(batch) - len(delivered)} failed")
@@ -0,0 +1,69 @@
+"""
+Update processing for Secret Santa Bot
+
+ChatOrderedUpdateProcessor lets the Application handle updates from
+different chats at the same time, so a slow command in one group no longer
+delays every other group, while the updates of any one chat still run one
+at a time in the order they arrived.
+"""
+import asyncio
+from typing import Any, Awaitable, Dict, Hashable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Bound of the base class semaphore, which is held while an update waits for
+# its chat's earlier updates; it only caps updates in flight, waiting or running
+MAX_PENDING_UPDATES = 10000
+
+
+def chat_key(update: object) -> Optional[Hashable]:
+    """The chat an update belongs to, or None for updates without a chat"""
+    if isinstance(update, Update) and update.effective_chat:
+        return update.effective_chat.id
+    return None
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Runs up to `concurrency` updates at once, serialised per effective_chat.id"""
+
+    def __init__(self, concurrency: int, max_pending: int = MAX_PENDING_UPDATES):
+        if concurrency < 1:
+            raise ValueError("concurrency must be a positive integer")
+        # A chat waiting for its earlier updates must not take a running slot,
+        # so the limit on running updates is our own semaphore
+        super().__init__(max(max_pending, concurrency))
+        self.concurrency = concurrency
+        self.running = asyncio.Semaphore(concurrency)
+        # chat -> event set when that chat's latest update has finished
+        self.tails: Dict[Hashable, asyncio.Event] = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = chat_key(update)
+        if key is None:
+            async with self.running:
+                await coroutine
+            return
+
+        # Called in arrival order, so chaining on the previous tail keeps the chat's order
+        previous = self.tails.get(key)
+        done = self.tails[key] = asyncio.Event()
+        try:
+            if previous is not None:
+                await previous.wait()
+            async with self.running:
+                await coroutine
+        except asyncio.CancelledError:
+            # Cancelled before it ran (e.g. on shutdown)
+            coroutine.close()
+            raise
+        finally:
+            done.set()
+            if self.tails.get(key) is done:
+                del self.tails[key]
+
+    async def initialize(self) -> None:
+        """Nothing to set up"""
+
+    async def shutdown(self) -> None:
+        """Nothing to release; pending updates are dropped by the Application"""
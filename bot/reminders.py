@@ -0,0 +1,91 @@
+"""
+Event-date reminders for Secret Santa Bot
+
+ReminderScheduler wakes up every REMINDER_INTERVAL and asks the storage for
+the groups whose event is one of REMINDER_DAYS days away and that were not
+reminded yet today. That is one indexed range query per batch, however many
+groups there are. The reminders are queued in the outbox in the same
+transaction that marks the groups reminded, so the outbox worker's rate
+limit applies and a group is reminded at most once a day even with several
+instances running.
+"""
+import asyncio
+import logging
+from datetime import date
+from typing import List, Optional, Sequence, Tuple
+
+from bot.outbox import OutboxWorker
+from bot.storage import Storage
+from bot.translations import get_text
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks; reminders go out within this long after midnight
+REMINDER_INTERVAL = 15 * 60
+# Groups claimed per query; a tick keeps claiming until a batch comes back short
+REMINDER_BATCH = 1000
+
+
+def render_reminders(rows: List[Tuple]) -> List[Tuple[int, str]]:
+    """One reminder per group with participants, posted to the group chat"""
+    messages = []
+    for group_id, lang, event_date, days_left, participant_count, missing_wishes in rows:
+        if not participant_count:
+            continue
+        if days_left == 0:
+            text = get_text(lang, "reminder_today")
+        elif days_left == 1:
+            text = get_text(lang, "reminder_tomorrow", date=event_date)
+        else:
+            text = get_text(lang, "reminder_days_left", days=days_left, date=event_date)
+        if missing_wishes:
+            text += get_text(lang, "reminder_wishes_missing", count=missing_wishes)
+        messages.append((group_id, text))
+    return messages
+
+
+class ReminderScheduler:
+    """Background task that queues event-date reminders"""
+
+    def __init__(self, storage: Storage, outbox: OutboxWorker, days_before: Sequence[int]):
+        self.storage = storage
+        self.outbox = outbox
+        self.days_before = list(days_before)
+        self.stopping = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self.run(), name="reminders")
+
+    async def stop(self) -> None:
+        if not self.task:
+            return
+        self.stopping.set()
+        await self.task
+        self.task = None
+
+    async def run(self) -> None:
+        logger.info(f"Reminder scheduler started (days before the event: {self.days_before})")
+        while not self.stopping.is_set():
+            try:
+                await self.tick(date.today())
+            except Exception as e:
+                logger.error(f"Reminder tick failed: {e}")
+            try:
+                await asyncio.wait_for(self.stopping.wait(), REMINDER_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def tick(self, today: date) -> int:
+        """Queue every reminder due today; returns the number of groups reminded"""
+        total = 0
+        while True:
+            rows = await self.storage.claim_due_reminders(today, self.days_before, REMINDER_BATCH, render_reminders)
+            if rows:
+                total += len(rows)
+                self.outbox.wake()
+            if len(rows) < REMINDER_BATCH:
+                break
+        if total:
+            logger.info(f"⏰ Reminders queued for {total} groups")
+        return total
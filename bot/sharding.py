@@ -0,0 +1,192 @@
+"""
+Multi-process worker mode for Secret Santa Bot
+
+With WORKERS > 1 the main process becomes a thin front: it still receives
+updates by polling or through the webhook server, but its only handler
+hands each update to one of N worker processes, chosen by chat id. A chat
+therefore always lands on the same worker, and the worker's
+ChatOrderedUpdateProcessor keeps that chat's updates in order. Each worker
+runs the full handler set with its own storage and connection pool, so
+workers need the shared PostgreSQL backend; main() refuses WORKERS > 1
+with any other. Every worker also delivers from the shared outbox, at
+1/WORKERS of the bot's message rate.
+
+The front supervises the workers and restarts any that exit. A restarted
+worker gets a fresh queue, because a process that died while reading could
+leave the old queue's lock held; updates queued for the dead worker are lost.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import queue
+import signal
+import time
+from typing import List, Optional
+
+from telegram import Update
+from telegram.ext import Application, TypeHandler
+
+from bot.processing import chat_key
+
+logger = logging.getLogger(__name__)
+
+# How often the front checks that every worker is alive
+SUPERVISE_INTERVAL = 1.0
+# A worker that exits sooner than this after starting is restarted only after this delay
+MIN_WORKER_UPTIME = 10.0
+# Workers wake up this often while their queue is empty, so shutdown never hangs
+QUEUE_POLL_TIMEOUT = 1.0
+WORKER_STOP_TIMEOUT = 30.0
+
+
+def shard_for(update: object, workers: int) -> int:
+    """The worker an update belongs to; updates without a chat go to worker 0"""
+    key = chat_key(update)
+    return key % workers if key is not None else 0
+
+
+class WorkerPool:
+    """Worker processes, each fed through its own queue"""
+
+    def __init__(self, workers: int):
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = workers
+        self.queues: List[Optional[multiprocessing.Queue]] = [None] * workers
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self.started_at = [0.0] * workers
+        self.restarts = 0
+
+    def start_worker(self, shard: int) -> None:
+        old_queue = self.queues[shard]
+        if old_queue is not None:
+            old_queue.close()
+            old_queue.cancel_join_thread()
+        self.queues[shard] = self.context.Queue()
+        process = self.context.Process(
+            target=worker_main, args=(shard, self.workers, self.queues[shard]), name=f"secretsanta-worker-{shard}"
+        )
+        process.start()
+        self.processes[shard] = process
+        self.started_at[shard] = time.monotonic()
+        logger.info(f"Started worker {shard} (pid {process.pid})")
+
+    def start(self) -> None:
+        for shard in range(self.workers):
+            self.start_worker(shard)
+
+    def dispatch(self, update: Update) -> None:
+        """Queue an update for its worker (never blocks)"""
+        self.queues[shard_for(update, self.workers)].put(update.to_json())
+
+    async def supervise(self) -> None:
+        """Restart workers that exit, backing off on crash loops"""
+        while True:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            for shard, process in enumerate(self.processes):
+                if process.is_alive():
+                    continue
+                uptime = time.monotonic() - self.started_at[shard]
+                logger.error(f"Worker {shard} exited with code {process.exitcode} after {uptime:.0f}s; restarting")
+                if uptime < MIN_WORKER_UPTIME:
+                    await asyncio.sleep(MIN_WORKER_UPTIME - uptime)
+                self.restarts += 1
+                self.start_worker(shard)
+
+    def stop(self) -> None:
+        """Ask every worker to finish its current updates and exit"""
+        for worker_queue in self.queues:
+            worker_queue.put(None)
+        deadline = time.monotonic() + WORKER_STOP_TIMEOUT
+        for shard, process in enumerate(self.processes):
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"Worker {shard} did not stop in time; terminating")
+                process.terminate()
+                process.join()
+        logger.info(f"All {self.workers} workers stopped ({self.restarts} restarts)")
+
+
+async def _forward(update: Update, context) -> None:
+    context.application.bot_data["workers"].dispatch(update)
+
+
+async def _front_post_init(application: Application) -> None:
+    workers: WorkerPool = application.bot_data["workers"]
+    workers.start()
+    application.bot_data["supervisor"] = asyncio.create_task(workers.supervise())
+
+
+async def _front_post_shutdown(application: Application) -> None:
+    application.bot_data["supervisor"].cancel()
+    application.bot_data["workers"].stop()
+
+
+def build_front_application(token: str, workers: int) -> Application:
+    """Application for the front process: receives updates and hands them to the workers"""
+    application = (
+        Application.builder()
+        .token(token)
+        .post_init(_front_post_init)
+        .post_shutdown(_front_post_shutdown)
+        .build()
+    )
+    application.bot_data["workers"] = WorkerPool(workers)
+    application.add_handler(TypeHandler(Update, _forward))
+    return application
+
+
+def worker_main(shard: int, workers: int, updates: multiprocessing.Queue) -> None:
+    """Entry point of a worker process"""
+    # Ctrl+C reaches the whole process group; the front coordinates shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from bot.config import (
+        get_bot_token, get_metrics_config, get_tracing_config, get_update_concurrency, get_reminder_days,
+        get_history_policy, get_message_rate,
+    )
+    from bot.main import build_application
+    from bot.notifications import set_rate_limit
+    from bot.tracing import configure as configure_tracing
+
+    configure_tracing(**get_tracing_config())
+    # Every worker delivers from the shared outbox; together they stay under Telegram's limit
+    set_rate_limit(get_message_rate(), workers)
+    metrics = get_metrics_config()
+    if metrics:
+        # One endpoint per worker: METRICS_PORT + shard
+        metrics["port"] += shard
+    application = build_application(
+        get_bot_token(), get_update_concurrency(), metrics, get_reminder_days(), get_history_policy()
+    )
+    asyncio.run(run_worker(application, shard, updates))
+
+
+async def run_worker(application: Application, shard: int, updates: multiprocessing.Queue) -> None:
+    """Feed updates from the front into the application until the front sends None"""
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        logger.info(f"Worker {shard} ready")
+        try:
+            while not stop.is_set():
+                try:
+                    payload = await loop.run_in_executor(None, updates.get, True, QUEUE_POLL_TIMEOUT)
+                except queue.Empty:
+                    continue
+                if payload is None:
+                    break
+                update = Update.de_json(json.loads(payload), application.bot)
+                await application.update_queue.put(update)
+        finally:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+
+    if application.post_shutdown:
+        await application.post_shutdown(application)
@@ -0,0 +1,218 @@
+"""
+Storage backends for Secret Santa Bot
+
+Handlers only talk to the Storage interface. The concrete backend is chosen
+with the STORAGE_BACKEND environment variable:
+
+* postgres (default) - bot.database.AsyncDatabase, for production
+* sqlite - bot.storage.sqlite.SQLiteStorage, for single-node installs
+* memory - bot.storage.memory.MemoryStorage, for tests and benchmarks
+  (nothing is persisted)
+
+Row shapes are part of the interface: every backend returns the same tuples
+as AsyncDatabase.
+
+Direct messages go through the outbox: state changes that notify people
+take a render callback that turns their result rows into (chat_id, text)
+messages, which are queued in the same transaction. bot.outbox delivers them.
+"""
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from bot.cache import TTLCache
+from bot.config import get_storage_backend, get_database_prepare, get_cache_ttl
+
+# Last title written per chat id, so unchanged titles skip the UPDATE
+TITLE_CACHE_SIZE = 10000
+TITLE_CACHE_TTL = 3600  # 1 hour
+
+# Result rows -> (chat_id, text) messages to queue with the change
+Render = Callable[[List[Tuple]], Iterable[Tuple[int, str]]]
+
+
+class Storage(ABC):
+    """Async storage interface used by the handlers"""
+
+    async def open(self) -> None:
+        """Connect and prepare the schema; called once from post_init"""
+
+    async def close(self) -> None:
+        """Release resources; called once on shutdown"""
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Connection pool statistics for the metrics endpoint; empty if there is no pool"""
+        return {}
+
+    def caches(self) -> Dict[str, TTLCache]:
+        """In-process caches by name, for the metrics endpoint; empty if there are none"""
+        return {}
+
+    @abstractmethod
+    async def create_group(self, group_id: int, admin_id: int, title: Optional[str] = None) -> bool:
+        """Create a new Secret Santa group (or take it over as admin)"""
+
+    @abstractmethod
+    async def get_group(self, group_id: int) -> Optional[Tuple]:
+        """(group_id, admin_id, event_date, max_price, language, is_assigned) or None"""
+
+    @abstractmethod
+    async def update_group_settings(self, group_id: int, event_date: Optional[str] = None,
+                                    max_price: Optional[float] = None) -> bool:
+        """Update the event date and/or max price"""
+
+    @abstractmethod
+    async def set_group_title(self, group_id: int, title: Optional[str]) -> bool:
+        """Store a group's chat title; True if it changed"""
+
+    @abstractmethod
+    async def add_participant(self, group_id: int, user_id: int, username: Optional[str],
+                              first_name: Optional[str]) -> bool:
+        """Add a participant; False if already present"""
+
+    @abstractmethod
+    async def get_participants(self, group_id: int) -> List[Tuple]:
+        """(user_id, username, first_name, assigned_to) rows"""
+
+    @abstractmethod
+    async def get_participants_page(self, group_id: int, after: Optional[int] = None, before: Optional[int] = None,
+                                    limit: int = 50) -> Tuple[List[Tuple], int]:
+        """
+        One page of the roster in join order, by keyset: up to limit
+        (id, user_id, username, first_name) rows with id > after, or the
+        last limit rows with id < before, and the group's participant count
+        """
+
+    @abstractmethod
+    async def assign_secret_santas(self, group_id: int, render: Optional[Render] = None,
+                                   history_seasons: int = 0, history_hard: bool = False) -> Tuple[List[Tuple], bool]:
+        """
+        Draw and store assignments, at most once per group and season;
+        returns (rows, drawn) with (giver_id, giver_username, giver_first_name,
+        receiver_id, receiver_username, receiver_first_name, receiver_wish)
+        rows and whether this call made the draw. A group that is already
+        assigned returns its existing rows with drawn False; a failure returns
+        ([], False). When this call draws, render's messages are queued and
+        the pairs appended to the group's assignment history with the
+        assignments. The draw respects the group's exclusions and avoids the
+        pairs of the last history_seasons seasons, as exclusions when
+        history_hard, otherwise only if possible. Raises
+        bot.assignment.Infeasible when no valid assignment exists
+        """
+
+    @abstractmethod
+    async def start_new_season(self, group_id: int) -> Optional[int]:
+        """
+        Clear a drawn group's assignments, wishes and event date so it can
+        draw again, keeping participants, exclusions and history; returns
+        the new season number, or None if the group has not drawn yet
+        """
+
+    @abstractmethod
+    async def add_exclusion(self, group_id: int, user_a: int, user_b: int) -> bool:
+        """Forbid two participants from drawing each other (both directions)"""
+
+    @abstractmethod
+    async def remove_exclusion(self, group_id: int, user_a: int, user_b: int) -> bool:
+        """Lift an exclusion between two participants; False if there was none"""
+
+    @abstractmethod
+    async def get_exclusions(self, group_id: int) -> List[Tuple]:
+        """(giver_id, receiver_id) rows the draw must avoid"""
+
+    @abstractmethod
+    async def get_assignment(self, group_id: int, user_id: int) -> Optional[Tuple]:
+        """(user_id, username, first_name, wish) of the user's assignee, or None"""
+
+    @abstractmethod
+    async def is_group_assigned(self, group_id: int) -> bool:
+        """Whether the group's draw has happened"""
+
+    @abstractmethod
+    async def get_language(self, group_id: int) -> str:
+        """The group's language, or the default for unknown chats"""
+
+    @abstractmethod
+    async def set_language(self, group_id: int, language: str) -> bool:
+        """Set the group's language; False if the group doesn't exist"""
+
+    @abstractmethod
+    async def get_user_groups(self, user_id: int) -> List[Tuple]:
+        """(group_id, language) rows for the user's assigned groups"""
+
+    @abstractmethod
+    async def get_participant_groups(self, user_id: int) -> List[Tuple]:
+        """(group_id, language) rows for every group the user joined"""
+
+    @abstractmethod
+    async def get_user_dashboard(self, user_id: int) -> List[Tuple]:
+        """
+        (group_id, language, title, event_date, max_price, assignee_id,
+        assignee_username, assignee_first_name, assignee_wish) rows
+        """
+
+    @abstractmethod
+    async def get_secret_santa_for_user(self, group_id: int, user_id: int) -> Optional[Tuple]:
+        """(user_id, username, first_name) of the user's Secret Santa, or None"""
+
+    @abstractmethod
+    async def set_wish(self, group_id: int, user_id: int, wish: str) -> bool:
+        """Set a participant's wish in one group"""
+
+    @abstractmethod
+    async def set_wish_everywhere(self, user_id: int, wish: str,
+                                  render: Optional[Render] = None) -> Optional[List[Tuple]]:
+        """
+        Set the wish in every group the user joined; returns (group_id,
+        language, santa_id, santa_username, santa_first_name) rows, or None
+        on error. render's messages are queued with the change
+        """
+
+    @abstractmethod
+    async def get_wish(self, group_id: int, user_id: int) -> Optional[str]:
+        """A participant's wish"""
+
+    @abstractmethod
+    async def enqueue_messages(self, messages: Iterable[Tuple[int, str]]) -> bool:
+        """Queue (chat_id, text) messages for delivery"""
+
+    @abstractmethod
+    async def claim_outbox(self, limit: int, lease_seconds: float) -> List[Tuple]:
+        """
+        Claim up to limit due messages as (message_id, chat_id, text,
+        attempts) rows; they are hidden from other claimers for lease_seconds
+        """
+
+    @abstractmethod
+    async def complete_outbox(self, message_ids: List[int]) -> None:
+        """Remove delivered messages"""
+
+    @abstractmethod
+    async def release_outbox(self, message_id: int, error: str, retry_in: Optional[float]) -> None:
+        """Record a failed attempt; retry after retry_in seconds, or give up if None"""
+
+    @abstractmethod
+    async def claim_due_reminders(self, today: date, days_before: Sequence[int], limit: int,
+                                  render: Render) -> List[Tuple]:
+        """
+        Claim up to limit groups whose event_date is one of days_before days
+        after today and that were not reminded today; returns (group_id,
+        language, event_date, days_left, participant_count, missing_wishes)
+        rows. The groups are marked reminded and render's messages queued in
+        the same transaction
+        """
+
+
+def create_storage(backend: Optional[str] = None) -> Storage:
+    """Instantiate the configured storage backend (not yet opened)"""
+    backend = backend or get_storage_backend()
+    if backend == "postgres":
+        from bot.database import AsyncDatabase
+        return AsyncDatabase(prepare=get_database_prepare(), cache_ttl=get_cache_ttl())
+    if backend == "sqlite":
+        from bot.storage.sqlite import SQLiteStorage
+        return SQLiteStorage()
+    if backend == "memory":
+        from bot.storage.memory import MemoryStorage
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend '{backend}'")
@@ -0,0 +1,325 @@
+"""
+In-memory storage backend for Secret Santa Bot
+
+Plain dicts with the indexes the handlers need, so every operation is a few
+dict lookups. Nothing is persisted; meant for tests, benchmarks and trying
+the bot out.
+"""
+import bisect
+import itertools
+import logging
+import time
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from bot.assignment import draw
+from bot.storage import Storage, Render
+from bot.translations import DEFAULT_LANGUAGE
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryStorage(Storage):
+    """Storage kept in process memory"""
+
+    def __init__(self):
+        # group_id -> {"admin_id", "event_date", "max_price", "language", "is_assigned", "title", "reminded_on",
+        #              "season"}
+        self.groups: Dict[int, dict] = {}
+        # group_id -> user_id -> {"id", "username", "first_name", "assigned_to", "wish"} (join order)
+        self.participants: Dict[int, Dict[int, dict]] = {}
+        self.participant_ids = itertools.count(1)
+        # user_id -> group ids the user joined
+        self.user_groups: Dict[int, Set[int]] = {}
+        # (group_id, receiver_id) -> giver_id
+        self.santas: Dict[Tuple[int, int], int] = {}
+        # group_id -> (giver_id, receiver_id) pairs the draw must avoid
+        self.exclusions: Dict[int, Set[Tuple[int, int]]] = {}
+        # group_id -> (season, giver_id, receiver_id) of every draw, oldest first
+        self.history: Dict[int, List[Tuple[int, int, int]]] = {}
+        # message_id -> {"chat_id", "text", "attempts", "next_attempt_at", "last_error", "failed"}
+        self.outbox: Dict[int, dict] = {}
+        self.outbox_ids = itertools.count(1)
+
+    async def open(self) -> None:
+        logger.info("Using in-memory storage (nothing is persisted)")
+
+    async def create_group(self, group_id: int, admin_id: int, title: Optional[str] = None) -> bool:
+        group = self.groups.get(group_id)
+        if group:
+            group["admin_id"] = admin_id
+            group["title"] = title or group["title"]
+        else:
+            self.groups[group_id] = {
+                "admin_id": admin_id,
+                "event_date": None,
+                "max_price": None,
+                "language": DEFAULT_LANGUAGE,
+                "is_assigned": False,
+                "title": title,
+                "reminded_on": None,
+                "season": 1,
+            }
+            self.participants[group_id] = {}
+        return True
+
+    async def get_group(self, group_id: int) -> Optional[Tuple]:
+        group = self.groups.get(group_id)
+        if not group:
+            return None
+        return (group_id, group["admin_id"], group["event_date"], group["max_price"],
+                group["language"], group["is_assigned"])
+
+    async def update_group_settings(self, group_id: int, event_date: Optional[str] = None,
+                                    max_price: Optional[float] = None) -> bool:
+        group = self.groups.get(group_id)
+        if group:
+            if event_date is not None:
+                group["event_date"] = event_date
+            if max_price is not None:
+                group["max_price"] = max_price
+        return True
+
+    async def set_group_title(self, group_id: int, title: Optional[str]) -> bool:
+        group = self.groups.get(group_id)
+        if not title or not group or group["title"] == title:
+            return False
+        group["title"] = title
+        return True
+
+    async def add_participant(self, group_id: int, user_id: int, username: Optional[str],
+                              first_name: Optional[str]) -> bool:
+        members = self.participants.get(group_id)
+        if members is None or user_id in members:
+            return False
+        members[user_id] = {
+            "id": next(self.participant_ids), "username": username, "first_name": first_name,
+            "assigned_to": None, "wish": None,
+        }
+        self.user_groups.setdefault(user_id, set()).add(group_id)
+        return True
+
+    async def get_participants(self, group_id: int) -> List[Tuple]:
+        return [
+            (user_id, p["username"], p["first_name"], p["assigned_to"])
+            for user_id, p in self.participants.get(group_id, {}).items()
+        ]
+
+    async def get_participants_page(self, group_id: int, after: Optional[int] = None, before: Optional[int] = None,
+                                    limit: int = 50) -> Tuple[List[Tuple], int]:
+        members = self.participants.get(group_id, {})
+        # Join order is id order
+        rows = [(p["id"], user_id, p["username"], p["first_name"]) for user_id, p in members.items()]
+        if before is not None:
+            position = bisect.bisect_left(rows, (before,))
+            return rows[max(0, position - limit):position], len(rows)
+        position = bisect.bisect_right(rows, (after or 0, float("inf")))
+        return rows[position:position + limit], len(rows)
+
+    def _assigned_rows(self, group_id: int) -> List[Tuple]:
+        members = self.participants.get(group_id, {})
+        results = []
+        for giver, g in members.items():
+            if g["assigned_to"] is not None:
+                r = members[g["assigned_to"]]
+                results.append((giver, g["username"], g["first_name"],
+                                g["assigned_to"], r["username"], r["first_name"], r["wish"]))
+        return results
+
+    async def assign_secret_santas(self, group_id: int, render: Optional[Render] = None,
+                                   history_seasons: int = 0, history_hard: bool = False) -> Tuple[List[Tuple], bool]:
+        # No awaits below, so the check and the draw are atomic on the event loop
+        group = self.groups.get(group_id)
+        if group is None:
+            return [], False
+        if group["is_assigned"]:
+            return self._assigned_rows(group_id), False
+        members = self.participants.get(group_id, {})
+        givers = list(members)
+        if len(givers) < 2:
+            return [], False
+        exclusions = list(self.exclusions.get(group_id, ()))
+        history = self.history.setdefault(group_id, [])
+        past = [
+            (giver, receiver) for season, giver, receiver in history
+            if season >= group["season"] - history_seasons
+        ]
+        if history_hard:
+            receivers = draw(givers, exclusions + past)
+        else:
+            receivers = draw(givers, exclusions, avoid=past)
+
+        for giver, receiver in zip(givers, receivers):
+            members[giver]["assigned_to"] = receiver
+            self.santas[(group_id, receiver)] = giver
+            history.append((group["season"], giver, receiver))
+        group["is_assigned"] = True
+        results = self._assigned_rows(group_id)
+        if render:
+            self._enqueue(render(results))
+        return results, True
+
+    async def start_new_season(self, group_id: int) -> Optional[int]:
+        group = self.groups.get(group_id)
+        if not group or not group["is_assigned"]:
+            return None
+        for participant in self.participants[group_id].values():
+            participant["assigned_to"] = None
+            participant["wish"] = None
+        self.santas = {key: giver for key, giver in self.santas.items() if key[0] != group_id}
+        group.update(season=group["season"] + 1, is_assigned=False, event_date=None, reminded_on=None)
+        return group["season"]
+
+    async def add_exclusion(self, group_id: int, user_a: int, user_b: int) -> bool:
+        if group_id not in self.groups:
+            return False
+        self.exclusions.setdefault(group_id, set()).update({(user_a, user_b), (user_b, user_a)})
+        return True
+
+    async def remove_exclusion(self, group_id: int, user_a: int, user_b: int) -> bool:
+        pairs = self.exclusions.get(group_id, set())
+        removed = {(user_a, user_b), (user_b, user_a)} & pairs
+        pairs -= removed
+        return bool(removed)
+
+    async def get_exclusions(self, group_id: int) -> List[Tuple]:
+        return sorted(self.exclusions.get(group_id, ()))
+
+    async def get_assignment(self, group_id: int, user_id: int) -> Optional[Tuple]:
+        members = self.participants.get(group_id, {})
+        giver = members.get(user_id)
+        if not giver or giver["assigned_to"] is None:
+            return None
+        r = members[giver["assigned_to"]]
+        return (giver["assigned_to"], r["username"], r["first_name"], r["wish"])
+
+    async def is_group_assigned(self, group_id: int) -> bool:
+        group = self.groups.get(group_id)
+        return bool(group and group["is_assigned"])
+
+    async def get_language(self, group_id: int) -> str:
+        group = self.groups.get(group_id)
+        return group["language"] if group else DEFAULT_LANGUAGE
+
+    async def set_language(self, group_id: int, language: str) -> bool:
+        group = self.groups.get(group_id)
+        if not group:
+            return False
+        group["language"] = language
+        return True
+
+    async def get_user_groups(self, user_id: int) -> List[Tuple]:
+        return [
+            (group_id, self.groups[group_id]["language"])
+            for group_id in sorted(self.user_groups.get(user_id, ()))
+            if self.groups[group_id]["is_assigned"]
+        ]
+
+    async def get_participant_groups(self, user_id: int) -> List[Tuple]:
+        return [
+            (group_id, self.groups[group_id]["language"])
+            for group_id in sorted(self.user_groups.get(user_id, ()))
+        ]
+
+    async def get_user_dashboard(self, user_id: int) -> List[Tuple]:
+        results = []
+        for group_id in sorted(self.user_groups.get(user_id, ())):
+            group = self.groups[group_id]
+            assignment = await self.get_assignment(group_id, user_id)
+            if group["is_assigned"] and assignment:
+                results.append((group_id, group["language"], group["title"], group["event_date"],
+                                group["max_price"], *assignment))
+        return results
+
+    async def get_secret_santa_for_user(self, group_id: int, user_id: int) -> Optional[Tuple]:
+        giver = self.santas.get((group_id, user_id))
+        if giver is None:
+            return None
+        g = self.participants[group_id][giver]
+        return (giver, g["username"], g["first_name"])
+
+    async def set_wish(self, group_id: int, user_id: int, wish: str) -> bool:
+        participant = self.participants.get(group_id, {}).get(user_id)
+        if not participant:
+            return False
+        participant["wish"] = wish
+        return True
+
+    async def set_wish_everywhere(self, user_id: int, wish: str,
+                                  render: Optional[Render] = None) -> Optional[List[Tuple]]:
+        results = []
+        for group_id in sorted(self.user_groups.get(user_id, ())):
+            self.participants[group_id][user_id]["wish"] = wish
+            santa = None
+            if self.groups[group_id]["is_assigned"]:
+                santa = await self.get_secret_santa_for_user(group_id, user_id)
+            results.append((group_id, self.groups[group_id]["language"], *(santa or (None, None, None))))
+        if render:
+            self._enqueue(render(results))
+        return results
+
+    async def get_wish(self, group_id: int, user_id: int) -> Optional[str]:
+        participant = self.participants.get(group_id, {}).get(user_id)
+        return participant["wish"] if participant else None
+
+    def _enqueue(self, messages: Iterable[Tuple[int, str]]) -> None:
+        for chat_id, text in messages:
+            self.outbox[next(self.outbox_ids)] = {
+                "chat_id": chat_id,
+                "text": text,
+                "attempts": 0,
+                "next_attempt_at": 0.0,
+                "last_error": None,
+                "failed": False,
+            }
+
+    async def enqueue_messages(self, messages: Iterable[Tuple[int, str]]) -> bool:
+        self._enqueue(messages)
+        return True
+
+    async def claim_outbox(self, limit: int, lease_seconds: float) -> List[Tuple]:
+        now = time.monotonic()
+        due = [
+            message_id for message_id, m in self.outbox.items()
+            if not m["failed"] and m["next_attempt_at"] <= now
+        ][:limit]
+        results = []
+        for message_id in due:
+            m = self.outbox[message_id]
+            m["next_attempt_at"] = now + lease_seconds
+            results.append((message_id, m["chat_id"], m["text"], m["attempts"]))
+        return results
+
+    async def complete_outbox(self, message_ids: List[int]) -> None:
+        for message_id in message_ids:
+            self.outbox.pop(message_id, None)
+
+    async def release_outbox(self, message_id: int, error: str, retry_in: Optional[float]) -> None:
+        m = self.outbox.get(message_id)
+        if not m:
+            return
+        m["attempts"] += 1
+        m["last_error"] = error
+        if retry_in is None:
+            m["failed"] = True
+        else:
+            m["next_attempt_at"] = time.monotonic() + retry_in
+
+    async def claim_due_reminders(self, today: date, days_before: Sequence[int], limit: int,
+                                  render: Render) -> List[Tuple]:
+        results = []
+        for group_id in sorted(self.groups):
+            group = self.groups[group_id]
+            if not group["event_date"] or (group["reminded_on"] and group["reminded_on"] >= today):
+                continue
+            days_left = (date.fromisoformat(group["event_date"]) - today).days
+            if days_left not in days_before:
+                continue
+            members = self.participants[group_id].values()
+            results.append((group_id, group["language"], group["event_date"], days_left,
+                            len(members), sum(1 for p in members if p["wish"] is None)))
+            group["reminded_on"] = today
+            if len(results) == limit:
+                break
+        self._enqueue(render(results))
+        return results
@@ -0,0 +1,557 @@
+"""
+SQLite storage backend for Secret Santa Bot
+
+For single-node installs that don't want to run PostgreSQL. All statements
+run on one dedicated worker thread that owns the connection, so the event
+loop never blocks on disk I/O and SQLite never sees concurrent writers.
+"""
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from bot.assignment import draw
+from bot.cache import TTLCache
+from bot.config import get_sqlite_path
+from bot.storage import Storage, Render, TITLE_CACHE_SIZE, TITLE_CACHE_TTL
+from bot.translations import DEFAULT_LANGUAGE
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS groups (
+        group_id INTEGER PRIMARY KEY,
+        admin_id INTEGER NOT NULL,
+        event_date TEXT,
+        max_price REAL,
+        language TEXT DEFAULT 'ru',
+        is_assigned INTEGER DEFAULT 0,
+        title TEXT,
+        reminded_on TEXT,
+        season INTEGER NOT NULL DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS participants (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        group_id INTEGER NOT NULL REFERENCES groups(group_id) ON DELETE CASCADE,
+        user_id INTEGER NOT NULL,
+        username TEXT,
+        first_name TEXT,
+        assigned_to INTEGER,
+        wish TEXT,
+        UNIQUE(group_id, user_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_participants_user_id ON participants (user_id);
+    CREATE INDEX IF NOT EXISTS idx_participants_group_assigned_to ON participants (group_id, assigned_to);
+    CREATE INDEX IF NOT EXISTS idx_participants_group_id_id ON participants (group_id, id);
+    CREATE INDEX IF NOT EXISTS idx_groups_event_date ON groups (event_date) WHERE event_date IS NOT NULL;
+    CREATE TABLE IF NOT EXISTS exclusions (
+        group_id INTEGER NOT NULL REFERENCES groups(group_id) ON DELETE CASCADE,
+        giver_id INTEGER NOT NULL,
+        receiver_id INTEGER NOT NULL,
+        PRIMARY KEY (group_id, giver_id, receiver_id)
+    );
+    CREATE TABLE IF NOT EXISTS assignment_history (
+        group_id INTEGER NOT NULL REFERENCES groups(group_id) ON DELETE CASCADE,
+        giver_id INTEGER NOT NULL,
+        season INTEGER NOT NULL,
+        receiver_id INTEGER NOT NULL,
+        drawn_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (group_id, giver_id, season)
+    );
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL DEFAULT 0,
+        last_error TEXT,
+        failed_at REAL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (next_attempt_at) WHERE failed_at IS NULL;
+"""
+
+
+def _enqueue(conn: sqlite3.Connection, messages: Iterable[Tuple[int, str]]) -> None:
+    conn.executemany("INSERT INTO outbox (chat_id, text) VALUES (?, ?)", list(messages))
+
+
+class SQLiteStorage(Storage):
+    """Storage in a local SQLite file"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_sqlite_path()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self.conn: Optional[sqlite3.Connection] = None
+        # chat id -> title last stored in groups.title
+        self.title_cache = TTLCache(TITLE_CACHE_SIZE, TITLE_CACHE_TTL)
+
+    def caches(self) -> Dict[str, TTLCache]:
+        return {"title": self.title_cache}
+
+    async def _run(self, fn, *args):
+        """Run fn(conn, *args) on the SQLite thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, self.conn, *args)
+
+    async def open(self) -> None:
+        def connect(_):
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            # Files created before reminders lack the column the index below needs
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(groups)")]
+            if columns and "reminded_on" not in columns:
+                conn.execute("ALTER TABLE groups ADD COLUMN reminded_on TEXT")
+            if columns and "season" not in columns:
+                conn.execute("ALTER TABLE groups ADD COLUMN season INTEGER NOT NULL DEFAULT 1")
+            conn.executescript(SCHEMA)
+            conn.commit()
+            return conn
+
+        self.conn = await self._run(connect)
+        logger.info(f"SQLite storage opened at {self.path}")
+
+    async def close(self) -> None:
+        if self.conn:
+            await self._run(lambda conn: conn.close())
+            self.conn = None
+        self.executor.shutdown(wait=True)
+        logger.info("SQLite storage closed")
+
+    async def _fetchone(self, sql: str, params: tuple = ()) -> Optional[Tuple]:
+        try:
+            return await self._run(lambda conn: conn.execute(sql, params).fetchone())
+        except sqlite3.Error as e:
+            logger.error(f"SQLite error: {e}")
+            return None
+
+    async def _fetchall(self, sql: str, params: tuple = ()) -> List[Tuple]:
+        try:
+            return await self._run(lambda conn: conn.execute(sql, params).fetchall())
+        except sqlite3.Error as e:
+            logger.error(f"SQLite error: {e}")
+            return []
+
+    async def _write(self, sql: str, params: tuple = ()) -> int:
+        """Execute and commit one statement; returns the row count, or -1 on error"""
+        def write(conn):
+            with conn:
+                return conn.execute(sql, params).rowcount
+
+        try:
+            return await self._run(write)
+        except sqlite3.Error as e:
+            logger.error(f"SQLite error: {e}")
+            return -1
+
+    async def create_group(self, group_id: int, admin_id: int, title: Optional[str] = None) -> bool:
+        created = await self._write(
+            """
+            INSERT INTO groups (group_id, admin_id, title) VALUES (?, ?, ?)
+            ON CONFLICT (group_id)
+            DO UPDATE SET admin_id = excluded.admin_id, title = COALESCE(excluded.title, groups.title)
+            """,
+            (group_id, admin_id, title)
+        ) >= 0
+        if created and title:
+            self.title_cache.set(group_id, title)
+        else:
+            self.title_cache.invalidate(group_id)
+        return created
+
+    async def get_group(self, group_id: int) -> Optional[Tuple]:
+        row = await self._fetchone(
+            "SELECT group_id, admin_id, event_date, max_price, language, is_assigned FROM groups WHERE group_id = ?",
+            (group_id,)
+        )
+        return row[:5] + (bool(row[5]),) if row else None
+
+    async def update_group_settings(self, group_id: int, event_date: Optional[str] = None,
+                                    max_price: Optional[float] = None) -> bool:
+        return await self._write(
+            """
+            UPDATE groups SET event_date = COALESCE(?, event_date), max_price = COALESCE(?, max_price)
+            WHERE group_id = ?
+            """,
+            (event_date, max_price, group_id)
+        ) >= 0
+
+    async def set_group_title(self, group_id: int, title: Optional[str]) -> bool:
+        # Skip the write lock entirely when the title is unchanged
+        if not title or self.title_cache.get(group_id) == title:
+            return False
+        changed = await self._write(
+            "UPDATE groups SET title = ? WHERE group_id = ? AND title IS NOT ?",
+            (title, group_id, title)
+        )
+        if changed >= 0:
+            self.title_cache.set(group_id, title)
+        return changed > 0
+
+    async def add_participant(self, group_id: int, user_id: int, username: Optional[str],
+                              first_name: Optional[str]) -> bool:
+        return await self._write(
+            """
+            INSERT INTO participants (group_id, user_id, username, first_name) VALUES (?, ?, ?, ?)
+            ON CONFLICT (group_id, user_id) DO NOTHING
+            """,
+            (group_id, user_id, username, first_name)
+        ) > 0
+
+    async def get_participants(self, group_id: int) -> List[Tuple]:
+        return await self._fetchall(
+            "SELECT user_id, username, first_name, assigned_to FROM participants WHERE group_id = ? ORDER BY id",
+            (group_id,)
+        )
+
+    async def get_participants_page(self, group_id: int, after: Optional[int] = None, before: Optional[int] = None,
+                                    limit: int = 50) -> Tuple[List[Tuple], int]:
+        def page(conn):
+            if before is not None:
+                rows = conn.execute(
+                    """
+                    SELECT id, user_id, username, first_name FROM participants
+                    WHERE group_id = ? AND id < ? ORDER BY id DESC LIMIT ?
+                    """,
+                    (group_id, before, limit)
+                ).fetchall()
+                rows.reverse()
+            else:
+                rows = conn.execute(
+                    """
+                    SELECT id, user_id, username, first_name FROM participants
+                    WHERE group_id = ? AND id > ? ORDER BY id LIMIT ?
+                    """,
+                    (group_id, after or 0, limit)
+                ).fetchall()
+            total = conn.execute("SELECT count(*) FROM participants WHERE group_id = ?", (group_id,)).fetchone()[0]
+            return rows, total
+
+        try:
+            return await self._run(page)
+        except sqlite3.Error as e:
+            logger.error(f"Error getting participants page for group {group_id}: {e}")
+            return [], 0
+
+    async def assign_secret_santas(self, group_id: int, render: Optional[Render] = None,
+                                   history_seasons: int = 0, history_hard: bool = False) -> Tuple[List[Tuple], bool]:
+        def assigned_rows(conn):
+            return conn.execute(
+                """
+                SELECT p.user_id, p.username, p.first_name, r.user_id, r.username, r.first_name, r.wish
+                FROM participants p
+                JOIN participants r ON r.group_id = p.group_id AND r.user_id = p.assigned_to
+                WHERE p.group_id = ?
+                ORDER BY p.id
+                """,
+                (group_id,)
+            ).fetchall()
+
+        def assign(conn):
+            # The single SQLite thread already serialises draws; the check
+            # below makes repeats return the existing result
+            with conn:
+                group = conn.execute(
+                    "SELECT is_assigned, season FROM groups WHERE group_id = ?", (group_id,)
+                ).fetchone()
+                if group is None:
+                    return [], False
+                if group[0]:
+                    return assigned_rows(conn), False
+                givers = [row[0] for row in conn.execute(
+                    "SELECT user_id FROM participants WHERE group_id = ? ORDER BY id", (group_id,)
+                )]
+                if len(givers) < 2:
+                    return [], False
+                exclusions, avoid = [], []
+                for giver_id, receiver_id, past in conn.execute(
+                    """
+                    SELECT giver_id, receiver_id, 0 FROM exclusions WHERE group_id = :group_id
+                    UNION ALL
+                    SELECT giver_id, receiver_id, 1 FROM assignment_history
+                    WHERE group_id = :group_id AND season >= :season - :seasons
+                    """,
+                    {"group_id": group_id, "season": group[1], "seasons": history_seasons}
+                ):
+                    (avoid if past and not history_hard else exclusions).append((giver_id, receiver_id))
+                # Infeasible propagates and rolls the transaction back
+                receivers = draw(givers, exclusions, avoid=avoid)
+                conn.executemany(
+                    "UPDATE participants SET assigned_to = ? WHERE group_id = ? AND user_id = ?",
+                    [(receiver, group_id, giver) for giver, receiver in zip(givers, receivers)]
+                )
+                conn.executemany(
+                    "INSERT INTO assignment_history (group_id, giver_id, season, receiver_id) VALUES (?, ?, ?, ?)",
+                    [(group_id, giver, group[1], receiver) for giver, receiver in zip(givers, receivers)]
+                )
+                conn.execute("UPDATE groups SET is_assigned = 1 WHERE group_id = ?", (group_id,))
+                results = assigned_rows(conn)
+                if render:
+                    _enqueue(conn, render(results))
+                return results, True
+
+        try:
+            results, drawn = await self._run(assign)
+            if drawn:
+                logger.info(f"Secret Santas assigned for group {group_id}")
+            return results, drawn
+        except sqlite3.Error as e:
+            logger.error(f"Error assigning secret santas for group {group_id}: {e}")
+            return [], False
+
+    async def start_new_season(self, group_id: int) -> Optional[int]:
+        def advance(conn):
+            with conn:
+                advanced = conn.execute(
+                    """
+                    UPDATE groups SET season = season + 1, is_assigned = 0, event_date = NULL, reminded_on = NULL
+                    WHERE group_id = ? AND is_assigned
+                    """,
+                    (group_id,)
+                ).rowcount
+                if not advanced:
+                    return None
+                conn.execute("UPDATE participants SET assigned_to = NULL, wish = NULL WHERE group_id = ?", (group_id,))
+                return conn.execute("SELECT season FROM groups WHERE group_id = ?", (group_id,)).fetchone()[0]
+
+        try:
+            season = await self._run(advance)
+            if season:
+                logger.info(f"Group {group_id} started season {season}")
+            return season
+        except sqlite3.Error as e:
+            logger.error(f"Error starting a new season for group {group_id}: {e}")
+            return None
+
+    async def add_exclusion(self, group_id: int, user_a: int, user_b: int) -> bool:
+        def add(conn):
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO exclusions (group_id, giver_id, receiver_id) VALUES (?, ?, ?)",
+                    [(group_id, user_a, user_b), (group_id, user_b, user_a)]
+                )
+
+        try:
+            await self._run(add)
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error adding exclusion in group {group_id}: {e}")
+            return False
+
+    async def remove_exclusion(self, group_id: int, user_a: int, user_b: int) -> bool:
+        return await self._write(
+            """
+            DELETE FROM exclusions
+            WHERE group_id = ? AND ((giver_id = ? AND receiver_id = ?) OR (giver_id = ? AND receiver_id = ?))
+            """,
+            (group_id, user_a, user_b, user_b, user_a)
+        ) > 0
+
+    async def get_exclusions(self, group_id: int) -> List[Tuple]:
+        return await self._fetchall(
+            "SELECT giver_id, receiver_id FROM exclusions WHERE group_id = ? ORDER BY giver_id, receiver_id",
+            (group_id,)
+        )
+
+    async def get_assignment(self, group_id: int, user_id: int) -> Optional[Tuple]:
+        return await self._fetchone(
+            """
+            SELECT p2.user_id, p2.username, p2.first_name, p2.wish
+            FROM participants p1
+            JOIN participants p2 ON p1.assigned_to = p2.user_id AND p1.group_id = p2.group_id
+            WHERE p1.group_id = ? AND p1.user_id = ?
+            """,
+            (group_id, user_id)
+        )
+
+    async def is_group_assigned(self, group_id: int) -> bool:
+        row = await self._fetchone("SELECT is_assigned FROM groups WHERE group_id = ?", (group_id,))
+        return bool(row and row[0])
+
+    async def get_language(self, group_id: int) -> str:
+        row = await self._fetchone("SELECT language FROM groups WHERE group_id = ?", (group_id,))
+        return row[0] if row else DEFAULT_LANGUAGE
+
+    async def set_language(self, group_id: int, language: str) -> bool:
+        return await self._write(
+            "UPDATE groups SET language = ? WHERE group_id = ?", (language, group_id)
+        ) > 0
+
+    async def get_user_groups(self, user_id: int) -> List[Tuple]:
+        return await self._fetchall(
+            """
+            SELECT g.group_id, g.language
+            FROM participants p JOIN groups g ON p.group_id = g.group_id
+            WHERE p.user_id = ? AND g.is_assigned
+            ORDER BY g.group_id
+            """,
+            (user_id,)
+        )
+
+    async def get_participant_groups(self, user_id: int) -> List[Tuple]:
+        return await self._fetchall(
+            """
+            SELECT g.group_id, g.language
+            FROM participants p JOIN groups g ON p.group_id = g.group_id
+            WHERE p.user_id = ?
+            ORDER BY g.group_id
+            """,
+            (user_id,)
+        )
+
+    async def get_user_dashboard(self, user_id: int) -> List[Tuple]:
+        return await self._fetchall(
+            """
+            SELECT g.group_id, g.language, g.title, g.event_date, g.max_price,
+                   r.user_id, r.username, r.first_name, r.wish
+            FROM participants p
+            JOIN groups g ON g.group_id = p.group_id
+            JOIN participants r ON r.group_id = p.group_id AND r.user_id = p.assigned_to
+            WHERE p.user_id = ? AND g.is_assigned
+            ORDER BY g.group_id
+            """,
+            (user_id,)
+        )
+
+    async def get_secret_santa_for_user(self, group_id: int, user_id: int) -> Optional[Tuple]:
+        return await self._fetchone(
+            "SELECT user_id, username, first_name FROM participants WHERE group_id = ? AND assigned_to = ?",
+            (group_id, user_id)
+        )
+
+    async def set_wish(self, group_id: int, user_id: int, wish: str) -> bool:
+        return await self._write(
+            "UPDATE participants SET wish = ? WHERE group_id = ? AND user_id = ?",
+            (wish, group_id, user_id)
+        ) > 0
+
+    async def set_wish_everywhere(self, user_id: int, wish: str,
+                                  render: Optional[Render] = None) -> Optional[List[Tuple]]:
+        def update(conn):
+            with conn:
+                conn.execute("UPDATE participants SET wish = ? WHERE user_id = ?", (wish, user_id))
+                results = conn.execute(
+                    """
+                    SELECT p.group_id, g.language, s.user_id, s.username, s.first_name
+                    FROM participants p
+                    JOIN groups g ON g.group_id = p.group_id
+                    LEFT JOIN participants s
+                        ON g.is_assigned AND s.group_id = p.group_id AND s.assigned_to = p.user_id
+                    WHERE p.user_id = ?
+                    ORDER BY p.group_id
+                    """,
+                    (user_id,)
+                ).fetchall()
+                if render:
+                    _enqueue(conn, render(results))
+                return results
+
+        try:
+            return await self._run(update)
+        except sqlite3.Error as e:
+            logger.error(f"Error setting wish for user {user_id}: {e}")
+            return None
+
+    async def get_wish(self, group_id: int, user_id: int) -> Optional[str]:
+        row = await self._fetchone(
+            "SELECT wish FROM participants WHERE group_id = ? AND user_id = ?", (group_id, user_id)
+        )
+        return row[0] if row else None
+
+    async def enqueue_messages(self, messages: Iterable[Tuple[int, str]]) -> bool:
+        messages = list(messages)
+
+        def enqueue(conn):
+            with conn:
+                _enqueue(conn, messages)
+
+        try:
+            await self._run(enqueue)
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error queueing messages: {e}")
+            return False
+
+    async def claim_outbox(self, limit: int, lease_seconds: float) -> List[Tuple]:
+        def claim(conn):
+            # The single SQLite thread makes select-then-lease atomic
+            now = time.time()
+            with conn:
+                rows = conn.execute(
+                    """
+                    SELECT id, chat_id, text, attempts FROM outbox
+                    WHERE failed_at IS NULL AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at, id
+                    LIMIT ?
+                    """,
+                    (now, limit)
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE outbox SET next_attempt_at = ? WHERE id = ?",
+                    [(now + lease_seconds, row[0]) for row in rows]
+                )
+                return rows
+
+        try:
+            return await self._run(claim)
+        except sqlite3.Error as e:
+            logger.error(f"Error claiming outbox messages: {e}")
+            return []
+
+    async def complete_outbox(self, message_ids: List[int]) -> None:
+        def complete(conn):
+            with conn:
+                conn.executemany("DELETE FROM outbox WHERE id = ?", [(message_id,) for message_id in message_ids])
+
+        try:
+            await self._run(complete)
+        except sqlite3.Error as e:
+            logger.error(f"Error completing outbox messages: {e}")
+
+    async def release_outbox(self, message_id: int, error: str, retry_in: Optional[float]) -> None:
+        now = time.time()
+        if retry_in is None:
+            sql, params = ("UPDATE outbox SET attempts = attempts + 1, last_error = ?, failed_at = ? WHERE id = ?",
+                           (error, now, message_id))
+        else:
+            sql, params = ("UPDATE outbox SET attempts = attempts + 1, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                           (error, now + retry_in, message_id))
+        await self._write(sql, params)
+
+    async def claim_due_reminders(self, today: date, days_before: Sequence[int], limit: int,
+                                  render: Render) -> List[Tuple]:
+        def claim(conn):
+            with conn:
+                rows = conn.execute(
+                    f"""
+                    SELECT g.group_id, g.language, g.event_date,
+                           CAST(julianday(g.event_date) - julianday(?) AS INTEGER) AS days_left,
+                           count(p.id), count(p.id) FILTER (WHERE p.wish IS NULL)
+                    FROM groups g LEFT JOIN participants p ON p.group_id = g.group_id
+                    WHERE g.event_date BETWEEN ? AND ?
+                      AND (g.reminded_on IS NULL OR g.reminded_on < ?)
+                    GROUP BY g.group_id
+                    HAVING days_left IN ({", ".join("?" * len(days_before))})
+                    ORDER BY g.group_id
+                    LIMIT ?
+                    """,
+                    (today.isoformat(), today.isoformat(), (today + timedelta(days=max(days_before))).isoformat(),
+                     today.isoformat(), *days_before, limit)
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE groups SET reminded_on = ? WHERE group_id = ?",
+                    [(today.isoformat(), row[0]) for row in rows]
+                )
+                _enqueue(conn, render(rows))
+                return rows
+
+        try:
+            return await self._run(claim)
+        except sqlite3.Error as e:
+            logger.error(f"Error claiming due reminders: {e}")
+            return []
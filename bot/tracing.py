@@ -0,0 +1,117 @@
+"""
+Per-update database tracing for Secret Santa Bot
+
+TracingApplication opens an UpdateTrace around each update it processes and
+keeps it in a context variable, so the storage layer can attribute every
+statement (and every wait for a pooled connection) to the update that caused
+it without threading anything through the handlers. When the update is done,
+it is logged if it ran too many queries or spent too long in the database,
+which is how N+1 regressions show up. Single statements over the slow-query
+threshold are logged as they finish, whether or not an update is traced.
+"""
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+# Overridden from the environment by configure()
+thresholds = {
+    "slow_query_ms": 100.0,
+    "max_queries": 10,
+    "max_db_ms": 250.0,
+}
+# Statements are logged by their first characters, whitespace collapsed
+STATEMENT_SUMMARY_LENGTH = 80
+
+
+def configure(slow_query_ms: float, max_queries: int, max_db_ms: float) -> None:
+    """Set the logging thresholds"""
+    thresholds.update(slow_query_ms=slow_query_ms, max_queries=max_queries, max_db_ms=max_db_ms)
+
+
+def summarize_statement(statement) -> str:
+    """First characters of a statement with whitespace collapsed"""
+    if isinstance(statement, bytes):
+        statement = statement.decode(errors="replace")
+    return " ".join(str(statement).split())[:STATEMENT_SUMMARY_LENGTH]
+
+
+def describe_update(update: object) -> str:
+    """Short label for an update: its id and the command, or the kind of update"""
+    if not isinstance(update, Update):
+        return type(update).__name__
+    message = update.effective_message
+    if update.callback_query:
+        kind = f"callback {update.callback_query.data}"
+    elif message and message.text and message.text.startswith("/"):
+        kind = message.text.split(maxsplit=1)[0]
+    elif update.chat_member:
+        kind = "chat_member"
+    else:
+        kind = "message" if message else "update"
+    return f"{update.update_id} {kind}"
+
+
+class UpdateTrace:
+    """Statements and connection waits attributed to one update"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.queries: List[Tuple[str, float]] = []
+        self.pool_wait = 0.0
+        self.started = time.perf_counter()
+
+    @property
+    def db_time(self) -> float:
+        return sum(seconds for _, seconds in self.queries)
+
+    def report(self) -> None:
+        """Log the update if it crossed a threshold"""
+        db_ms = self.db_time * 1000
+        if len(self.queries) < thresholds["max_queries"] and db_ms < thresholds["max_db_ms"]:
+            return
+        counts = Counter(statement for statement, _ in self.queries)
+        breakdown = "; ".join(f"{count}x {statement}" for statement, count in counts.most_common())
+        logger.warning(
+            f"Update {self.label}: {len(self.queries)} queries, {db_ms:.1f} ms in the database, "
+            f"{self.pool_wait * 1000:.1f} ms waiting for connections, "
+            f"{(time.perf_counter() - self.started) * 1000:.1f} ms total | {breakdown}"
+        )
+
+
+current_trace: ContextVar[Optional[UpdateTrace]] = ContextVar("current_trace", default=None)
+
+
+def record_query(statement, seconds: float) -> None:
+    """Record one executed statement; called by the storage backends"""
+    if seconds * 1000 >= thresholds["slow_query_ms"]:
+        logger.warning(f"Slow query ({seconds * 1000:.1f} ms): {summarize_statement(statement)}")
+    trace = current_trace.get()
+    if trace is not None:
+        trace.queries.append((summarize_statement(statement), seconds))
+
+
+def record_pool_wait(seconds: float) -> None:
+    """Record time spent waiting for a pooled connection"""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.pool_wait += seconds
+
+
+class TracingApplication(Application):
+    """Application that traces the database work of each update it processes"""
+
+    async def process_update(self, update: object) -> None:
+        trace = UpdateTrace(describe_update(update))
+        token = current_trace.set(trace)
+        try:
+            await super().process_update(update)
+        finally:
+            current_trace.reset(token)
+            trace.report()
@@ -1,6 +1,7 @@
 """
 Multi-language support for Secret Santa Bot
 """
+from string import Formatter
 
 TRANSLATIONS = {
     "en": {
@@ -9,8 +10,8 @@ TRANSLATIONS = {
         "start_group": "🎄 Hello! I'm the Secret Santa bot.\n\n👉 Admin: Use /setup to get started\n📖 Everyone: Use /help for instructions",
 
         # Help command
-        "help_private": "🎁 *Secret Santa Bot - Help*\n\n*For Group Admins:*\n• `/setup` - Create a Secret Santa group\n• `/setdate YYYY-MM-DD` - Set event date\n• `/setprice <amount>` - Set max gift price\n• `/assign` - Randomly assign Secret Santas\n• `/lang en` or `/lang ru` - Change language\n\n*For Participants:*\n• `/join` - Join the Secret Santa\n• `/info` - View event details\n• `/participants` - See who's participating\n• `/wish <text>` - Set your gift wish\n• `/myassignment` - View your assignment\n• `/chat <message>` - Send anonymous message\n\n*Getting Started:*\n1️⃣ Add me to a group\n2️⃣ Admin uses /setup\n3️⃣ Set date and price\n4️⃣ Everyone joins with /join\n5️⃣ Admin assigns with /assign\n6️⃣ Check your assignment with /myassignment",
-        "help_group": "🎁 *Secret Santa Bot - Help*\n\n*Admins:* /setup • /setdate • /setprice • /assign\n*Everyone:* /join • /info • /participants\n\nUse /help in private chat with me for detailed instructions!",
+        "help_private": "🎁 *Secret Santa Bot - Help*\n\n*For Group Admins:*\n• `/setup` - Create a Secret Santa group\n• `/setdate YYYY-MM-DD` - Set event date\n• `/setprice <amount>` - Set max gift price\n• `/exclude @user1 @user2` - Keep two people from drawing each other\n• `/assign` - Randomly assign Secret Santas\n• `/newseason` - Start over next year, keeping participants\n• `/lang en` or `/lang ru` - Change language\n\n*For Participants:*\n• `/join` - Join the Secret Santa\n• `/info` - View event details\n• `/participants` - See who's participating\n• `/wish <text>` - Set your gift wish\n• `/myassignment` - View your assignment\n• `/chat <message>` - Send anonymous message\n\n*Getting Started:*\n1️⃣ Add me to a group\n2️⃣ Admin uses /setup\n3️⃣ Set date and price\n4️⃣ Everyone joins with /join\n5️⃣ Admin assigns with /assign\n6️⃣ Check your assignment with /myassignment",
+        "help_group": "🎁 *Secret Santa Bot - Help*\n\n*Admins:* /setup • /setdate • /setprice • /exclude • /assign • /newseason\n*Everyone:* /join • /info • /participants\n\nUse /help in private chat with me for detailed instructions!",
 
         # Setup command
         "setup_private_only": "❌ This command only works in groups!\n\n💡 Add me to a group and try again.",
@@ -51,6 +52,9 @@ TRANSLATIONS = {
         "participants_setup_first": "❌ Please use /setup first to create the group!",
         "participants_none": "❌ No participants yet!\n\n💡 Use /join to participate.",
         "participants_list": "👥 *Participants ({count}):*\n\n{list}",
+        "participants_range": "\n\n📄 {first}–{last} of {total}",
+        "participants_prev": "◀️ Prev",
+        "participants_next": "Next ▶️",
 
         # Info command
         "info_group_only": "❌ This command only works in groups!",
@@ -74,6 +78,32 @@ TRANSLATIONS = {
         "assign_confirmation": "🎁 *Ready to assign Secret Santas?*\n\n👥 Participants: *{count}*\n\n⚠️ Once assigned, you cannot change them!\n\n👇 Click the button below:",
         "assign_success": "✅ *Secret Santas have been assigned!* 🎉\n\n📬 Everyone will receive a DM with their assignment.\n\n💡 Use /myassignment to check anytime!",
         "assign_error": "❌ Error assigning Secret Santas.\n\n💡 Please try again!",
+        "assign_infeasible": "❌ *No valid draw with the current exclusions.*\n\n{givers} can only give gifts to {receivers}: {available} people for {needed} Santas.\n\n💡 Lift an exclusion with `/unexclude @user1 @user2` and try again.",
+        "assign_infeasible_nobody": "nobody",
+
+        # Exclusions
+        "exclude_group_only": "❌ This command only works in groups!",
+        "exclude_admin_only": "❌ Only admins can manage exclusions!\n\n💡 Ask a group admin to run this command.",
+        "exclude_setup_first": "❌ Please use /setup first to create the group!",
+        "exclude_already_assigned": "❌ Secret Santas have already been assigned, exclusions can't change anymore.",
+        "exclude_usage": "🚫 *Exclusions*\n\nUsage: `/exclude @user1 @user2` - they won't draw each other\n`/unexclude @user1 @user2` - lift it\n\n✅ Example: `/exclude @alice @bob` for a couple",
+        "exclude_not_participant": "❌ {name} hasn't joined this Secret Santa.\n\n💡 Both people need to /join first.",
+        "exclude_same_person": "❌ Name two different participants!",
+        "exclude_success": "✅ {first} and {second} won't draw each other.",
+        "exclude_error": "❌ Error saving the exclusion. Please try again!",
+        "unexclude_success": "✅ {first} and {second} can draw each other again.",
+        "unexclude_not_found": "❌ {first} and {second} weren't excluded.",
+        "exclusions_list": "🚫 *Exclusions ({count}):*\n\n{list}",
+
+        # New season
+        "newseason_group_only": "❌ This command only works in groups!",
+        "newseason_admin_only": "❌ Only admins can start a new season!\n\n💡 Ask a group admin to run this command.",
+        "newseason_setup_first": "❌ Please use /setup first to create the group!",
+        "newseason_not_assigned": "❌ This season hasn't been drawn yet, there's nothing to start over.",
+        "newseason_button_text": "🔄 Start a new season",
+        "newseason_confirmation": "🔄 *Start a new season?*\n\nEveryone stays in, but the current assignments, wishes and event date are cleared so you can draw again.\n\n🎲 Pairs from recent seasons are avoided in the next draw.\n\n👇 Click the button below:",
+        "newseason_success": "🎄 *Season {season} has started!*\n\n📅 Set the date with /setdate, update wishes with /wish, and draw with /assign.",
+        "newseason_error": "❌ Error starting a new season. Please try again!",
 
         # Assignment DM
         "assignment_header": "🎅 *Your Secret Santa Assignment*\n\n",
@@ -109,6 +139,12 @@ TRANSLATIONS = {
         "wish_error": "❌ Error saving your wish.\n\n💡 Please try again!",
         "wish_display": "🎁 Wish: _{wish}_\n",
         "wish_not_set": "🎁 Wish: _Not set yet_\n",
+
+        # Event reminders
+        "reminder_days_left": "⏰ *{days} days left* until Secret Santa ({date})!",
+        "reminder_tomorrow": "⏰ *Secret Santa is tomorrow* ({date})! Get your gift ready 🎁",
+        "reminder_today": "🎄 *Today is Secret Santa day!* 🎁",
+        "reminder_wishes_missing": "\n\n🎁 {count} participant(s) haven't set a wish yet. DM me `/wish <your wish>` so your Secret Santa knows what to get!",
     },
     "ru": {
         # Start command
@@ -116,8 +152,8 @@ TRANSLATIONS = {
         "start_group": "🎄 Привет! Я бот для Тайного Санты.\n\n👉 Админ: Используй /setup для начала\n📖 Все: Используй /help для инструкций",
 
         # Help command
-        "help_private": "🎁 *Бот Тайный Санта - Помощь*\n\n*Для админов группы:*\n• `/setup` - Создать группу Тайного Санты\n• `/setdate ГГГГ-ММ-ДД` - Установить дату события\n• `/setprice <сумма>` - Установить макс. цену\n• `/assign` - Случайно назначить Тайных Сант\n• `/lang en` или `/lang ru` - Сменить язык\n\n*Для участников:*\n• `/join` - Присоединиться к Тайному Санте\n• `/info` - Посмотреть детали события\n• `/participants` - Кто участвует\n• `/wish <текст>` - Указать пожелание\n• `/myassignment` - Твоё назначение\n• `/chat <сообщение>` - Анонимное сообщение\n\n*Как начать:*\n1️⃣ Добавь меня в группу\n2️⃣ Админ использует /setup\n3️⃣ Установить дату и цену\n4️⃣ Все присоединяются через /join\n5️⃣ Админ назначает через /assign\n6️⃣ Проверь назначение через /myassignment",
-        "help_group": "🎁 *Бот Тайный Санта - Помощь*\n\n*Админы:* /setup • /setdate • /setprice • /assign\n*Все:* /join • /info • /participants\n\nИспользуй /help в личке со мной для подробных инструкций!",
+        "help_private": "🎁 *Бот Тайный Санта - Помощь*\n\n*Для админов группы:*\n• `/setup` - Создать группу Тайного Санты\n• `/setdate ГГГГ-ММ-ДД` - Установить дату события\n• `/setprice <сумма>` - Установить макс. цену\n• `/exclude @user1 @user2` - Чтобы двое не вытянули друг друга\n• `/assign` - Случайно назначить Тайных Сант\n• `/newseason` - Начать новый сезон с теми же участниками\n• `/lang en` или `/lang ru` - Сменить язык\n\n*Для участников:*\n• `/join` - Присоединиться к Тайному Санте\n• `/info` - Посмотреть детали события\n• `/participants` - Кто участвует\n• `/wish <текст>` - Указать пожелание\n• `/myassignment` - Твоё назначение\n• `/chat <сообщение>` - Анонимное сообщение\n\n*Как начать:*\n1️⃣ Добавь меня в группу\n2️⃣ Админ использует /setup\n3️⃣ Установить дату и цену\n4️⃣ Все присоединяются через /join\n5️⃣ Админ назначает через /assign\n6️⃣ Проверь назначение через /myassignment",
+        "help_group": "🎁 *Бот Тайный Санта - Помощь*\n\n*Админы:* /setup • /setdate • /setprice • /exclude • /assign • /newseason\n*Все:* /join • /info • /participants\n\nИспользуй /help в личке со мной для подробных инструкций!",
 
         # Setup command
         "setup_private_only": "Эта команда работает только в группах!",
@@ -158,6 +194,9 @@ TRANSLATIONS = {
         "participants_setup_first": "Пожалуйста, используй /setup сначала!",
         "participants_none": "Пока нет участников! Используй /join для участия.",
         "participants_list": "Участники ({count}):\n\n{list}",
+        "participants_range": "\n\n📄 {first}–{last} из {total}",
+        "participants_prev": "◀️ Назад",
+        "participants_next": "Далее ▶️",
 
         # Info command
         "info_group_only": "Эта команда работает только в группах!",
@@ -181,6 +220,32 @@ TRANSLATIONS = {
         "assign_confirmation": "Готов назначить Тайных Сант?\n\nУчастников: {count}\nНажми кнопку ниже для продолжения:",
         "assign_success": "Тайные Санты назначены! Проверь личные сообщения для своего назначения.",
         "assign_error": "Ошибка при назначении Тайных Сант. Попробуй снова!",
+        "assign_infeasible": "❌ *С текущими исключениями жеребьёвка невозможна.*\n\n{givers} могут дарить только: {receivers}. Получателей {available}, а Сант {needed}.\n\n💡 Сними исключение через `/unexclude @user1 @user2` и попробуй снова.",
+        "assign_infeasible_nobody": "никому",
+
+        # Exclusions
+        "exclude_group_only": "Эта команда работает только в группах!",
+        "exclude_admin_only": "Только админы группы могут управлять исключениями!",
+        "exclude_setup_first": "Пожалуйста, сначала используй /setup!",
+        "exclude_already_assigned": "Тайные Санты уже назначены, исключения больше нельзя менять.",
+        "exclude_usage": "🚫 *Исключения*\n\nИспользование: `/exclude @user1 @user2` - они не вытянут друг друга\n`/unexclude @user1 @user2` - снять исключение\n\nПример: `/exclude @alice @bob` для пары",
+        "exclude_not_participant": "{name} не участвует в этом Тайном Санте. Оба должны сначала использовать /join.",
+        "exclude_same_person": "Укажи двух разных участников!",
+        "exclude_success": "{first} и {second} не вытянут друг друга.",
+        "exclude_error": "Ошибка при сохранении исключения. Попробуй снова!",
+        "unexclude_success": "{first} и {second} снова могут вытянуть друг друга.",
+        "unexclude_not_found": "{first} и {second} не были исключены.",
+        "exclusions_list": "🚫 *Исключения ({count}):*\n\n{list}",
+
+        # New season
+        "newseason_group_only": "Эта команда работает только в группах!",
+        "newseason_admin_only": "Только админы группы могут начать новый сезон!",
+        "newseason_setup_first": "Пожалуйста, сначала используй /setup!",
+        "newseason_not_assigned": "В этом сезоне ещё не было жеребьёвки, начинать заново нечего.",
+        "newseason_button_text": "Начать новый сезон",
+        "newseason_confirmation": "Начать новый сезон?\n\nВсе участники остаются, но текущие назначения, пожелания и дата события будут сброшены, чтобы провести жеребьёвку снова.\n\nПары из недавних сезонов в новой жеребьёвке не повторятся, если это возможно.\n\nНажми кнопку ниже для продолжения:",
+        "newseason_success": "🎄 *Начался сезон {season}!*\n\nУстанови дату через /setdate, обнови пожелания через /wish и проведи жеребьёвку через /assign.",
+        "newseason_error": "Ошибка при начале нового сезона. Попробуй снова!",
 
         # Assignment DM
         "assignment_header": "Твоё назначение Тайного Санты:\n\n",
@@ -216,31 +281,80 @@ TRANSLATIONS = {
         "wish_error": "Ошибка при сохранении пожелания. Попробуй снова!",
         "wish_display": "🎁 Пожелание: _{wish}_\n",
         "wish_not_set": "🎁 Пожелание: _Не указано_\n",
+
+        # Event reminders
+        "reminder_days_left": "⏰ До Тайного Санты осталось дней: *{days}* ({date})!",
+        "reminder_tomorrow": "⏰ *Тайный Санта уже завтра* ({date})! Приготовь подарок 🎁",
+        "reminder_today": "🎄 *Сегодня день Тайного Санты!* 🎁",
+        "reminder_wishes_missing": "\n\n🎁 Участников без пожелания: {count}. Напиши мне в личку `/wish <пожелание>`, чтобы твой Тайный Санта знал, что подарить!",
     }
 }
 
 
+# Language of new groups (the groups.language column default) and of unknown codes
+DEFAULT_LANGUAGE = "ru"
+
+
+def _placeholders(text: str) -> frozenset:
+    """Names of the {fields} used in a template"""
+    return frozenset(field for _, field, _, _ in Formatter().parse(text) if field is not None)
+
+
+def _compile(translations: dict) -> dict:
+    """
+    Validate the translations and build per-language lookup tables.
+
+    Every language must define exactly the keys of the default language with
+    the same placeholders. Texts without placeholders are stored as plain
+    strings; templates are stored as their bound format_map method.
+
+    Raises:
+        ValueError: If a key or placeholder is missing in some language
+    """
+    reference = translations[DEFAULT_LANGUAGE]
+    problems = []
+    for lang, texts in translations.items():
+        for key in reference.keys() - texts.keys():
+            problems.append(f"{lang}: missing key '{key}'")
+        for key in texts.keys() - reference.keys():
+            problems.append(f"{lang}: unknown key '{key}'")
+        for key in texts.keys() & reference.keys():
+            expected = _placeholders(reference[key])
+            found = _placeholders(texts[key])
+            if found != expected:
+                problems.append(f"{lang}: '{key}' has placeholders {sorted(found)}, expected {sorted(expected)}")
+    if problems:
+        raise ValueError("Invalid translations:\n" + "\n".join(problems))
+
+    tables = {}
+    for lang, texts in translations.items():
+        tables[lang] = {
+            key: text.format_map if _placeholders(text) else text.format()
+            for key, text in texts.items()
+        }
+    return tables
+
+
+# Built once at import; a broken translation fails startup instead of a request
+_TABLES = _compile(TRANSLATIONS)
+
+
 def get_text(lang: str, key: str, **kwargs) -> str:
     """
     Get translated text for a given language and key.
 
     Args:
-        lang: Language code ('en' or 'ru')
+        lang: Language code ('en' or 'ru'); unknown codes fall back to DEFAULT_LANGUAGE
         key: Translation key
         **kwargs: Format arguments for the text
 
     Returns:
         Translated and formatted text
+
+    Raises:
+        KeyError: If the key or a placeholder argument is missing
     """
-    # Default to English if language not found
-    if lang not in TRANSLATIONS:
-        lang = "en"
-
-    # Get translation, fallback to English if key not found
-    text = TRANSLATIONS.get(lang, {}).get(key, TRANSLATIONS["en"].get(key, f"Missing translation: {key}"))
-
-    # Format with provided arguments
-    try:
-        return text.format(**kwargs)
-    except KeyError:
-        return text
+    entry = _TABLES.get(lang, _TABLES[DEFAULT_LANGUAGE])[key]
+    if entry.__class__ is str:
+        return entry
+    return entry(kwargs)
@@ -1,12 +1,32 @@
 """
 Utility functions for Secret Santa Bot
 """
-from bot.database import Database
+from bot.cache import MISSING
+from bot.context import BotContext
 
-# Initialize database
-db = Database()
+ADMIN_STATUSES = ("creator", "administrator")
+# Admin rights rarely change; chat_member updates refresh entries early
+ADMIN_CACHE_SIZE = 10000
+ADMIN_CACHE_TTL = 120  # 2 minutes
 
 
-def get_lang(chat_id: int) -> str:
+async def get_lang(context: BotContext, chat_id: int) -> str:
     """Get language preference for a chat"""
-    return db.get_language(chat_id)
+    return await context.db.get_language(chat_id)
+
+
+async def is_admin(context: BotContext, chat_id: int, user_id: int) -> bool:
+    """Check whether a user is an admin of a chat, using the admin cache"""
+    cached = context.admin_cache.get((chat_id, user_id))
+    if cached is not MISSING:
+        return cached
+
+    member = await context.bot.get_chat_member(chat_id, user_id)
+    result = member.status in ADMIN_STATUSES
+    context.admin_cache.set((chat_id, user_id), result)
+    return result
+
+
+def remember_member_status(context: BotContext, chat_id: int, user_id: int, status: str) -> None:
+    """Refresh the admin cache from a status seen in a chat_member update"""
+    context.admin_cache.set((chat_id, user_id), status in ADMIN_STATUSES)
@@ -0,0 +1,180 @@
+"""
+Embedded webhook server for Secret Santa Bot
+
+A small asyncio HTTP/1.1 server that accepts Telegram webhook POSTs, checks
+the secret token and feeds the updates into the Application's update queue.
+It has no dependencies beyond the standard library and python-telegram-bot,
+and it is stateless, so any number of instances can sit behind a load
+balancer. Only the instance configured with WEBHOOK_URL registers the
+webhook with Telegram.
+
+The bot itself is not quite stateless: each process caches group languages
+(5 minutes), admin rights (2 minutes) and group titles (1 hour), and another
+instance's writes do not invalidate them. Behind a load balancer a /language
+change or an admin demotion can take that long to reach the other instances
+unless CACHE_TTL lowers the TTLs (0 disables the caches).
+"""
+import asyncio
+import hmac
+import json
+import logging
+import signal
+from http import HTTPStatus
+from typing import Optional, Sequence
+
+from telegram import Update
+from telegram.ext import Application, ExtBot
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+# Telegram updates are small; anything larger is not from Telegram
+MAX_BODY_SIZE = 1024 * 1024
+MAX_HEADER_SIZE = 16 * 1024
+# Idle keep-alive connections are closed after this many seconds
+KEEPALIVE_TIMEOUT = 75
+
+
+class WebhookServer:
+    """Receives webhook requests and puts the decoded updates on the update queue"""
+
+    def __init__(self, application: Application, listen: str, port: int, url_path: str, secret_token: str):
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.path = "/" + url_path.strip("/")
+        self.secret_token = secret_token.encode()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.received = 0
+        self.rejected = 0
+
+    async def start(self) -> None:
+        """Start listening"""
+        self.server = await asyncio.start_server(
+            self._handle_connection, self.listen, self.port, limit=MAX_HEADER_SIZE
+        )
+        logger.info(f"Webhook server listening on {self.listen}:{self.port}{self.path}")
+
+    async def stop(self) -> None:
+        """Stop accepting connections and wait for the listener to close"""
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            logger.info(f"Webhook server stopped ({self.received} updates received, {self.rejected} rejected)")
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError):
+                    return
+
+                request_line, _, header_block = head.decode("latin-1").partition("\r\n")
+                method, _, rest = request_line.partition(" ")
+                path = rest.partition(" ")[0].split("?", 1)[0]
+                headers = {}
+                for line in header_block.split("\r\n"):
+                    name, sep, value = line.partition(":")
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                try:
+                    length = int(headers.get("content-length", "0"))
+                except ValueError:
+                    length = -1
+                if length < 0 or length > MAX_BODY_SIZE:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, keep_alive=False)
+                    return
+                body = await reader.readexactly(length) if length else b""
+
+                status = await self._dispatch(method, path, headers, body)
+                await self._respond(writer, status, keep_alive)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, headers: dict, body: bytes) -> HTTPStatus:
+        """Validate one request and enqueue its update"""
+        if method == "GET" and path == "/healthz":
+            return HTTPStatus.OK
+        if path != self.path:
+            return HTTPStatus.NOT_FOUND
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED
+
+        token = headers.get(SECRET_HEADER, "").encode()
+        if not hmac.compare_digest(token, self.secret_token):
+            self.rejected += 1
+            logger.warning("Rejected webhook request with a missing or wrong secret token")
+            return HTTPStatus.FORBIDDEN
+
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except Exception as e:
+            logger.error(f"Could not decode webhook update: {e}")
+            return HTTPStatus.BAD_REQUEST
+
+        if update:
+            if isinstance(self.application.bot, ExtBot):
+                self.application.bot.insert_callback_data(update)
+            await self.application.update_queue.put(update)
+            self.received += 1
+        return HTTPStatus.OK
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: HTTPStatus, keep_alive: bool) -> None:
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Length: 0\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+        )
+        await writer.drain()
+
+
+async def run_webhook(application: Application, config: dict, allowed_updates: Sequence[str]) -> None:
+    """
+    Run the application behind the embedded webhook server until SIGINT/SIGTERM.
+
+    Mirrors what Application.run_polling does for the lifecycle hooks.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    server = WebhookServer(
+        application,
+        listen=config["listen"],
+        port=config["port"],
+        url_path=config["url_path"],
+        secret_token=config["secret_token"],
+    )
+
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+
+        if config["webhook_url"]:
+            await application.bot.set_webhook(
+                url=config["webhook_url"],
+                secret_token=config["secret_token"],
+                allowed_updates=list(allowed_updates),
+            )
+            logger.info(f"Webhook registered at {config['webhook_url']}")
+
+        await application.start()
+        await server.start()
+        try:
+            await stop.wait()
+        finally:
+            await server.stop()
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+
+    if application.post_shutdown:
+        await application.post_shutdown(application)